@@ -0,0 +1,97 @@
+import numpy as np
+
+# Valores por defecto de los resúmenes que se envían al navegador
+HISTOGRAM_BINS = 30
+BOX_MAX_OUTLIERS = 200
+SAMPLE_SEED = 42
+
+# Dispersión: por encima de este número de puntos se dibuja una rejilla de densidad
+SCATTER_MAX_POINTS = 5000
+DENSITY_BINS = (80, 60)
+
+
+def _finite(values):
+    values = np.asarray(values, dtype='float64')
+    return values[~np.isnan(values)]
+
+
+# Bordes comunes para todas las clases; variables discretas (ed, employ...) usan un bin por entero
+def histogram_edges(values, bins=HISTOGRAM_BINS):
+    values = _finite(values)
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    low, high = values.min(), values.max()
+    if np.all(values == np.round(values)) and high - low + 1 <= bins:
+        return np.arange(low - 0.5, high + 1.5)
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    return np.linspace(low, high, bins + 1)
+
+
+# Conteos por bin y por clase en una sola pasada (np.bincount sobre índice combinado)
+def histogram_counts(values, classes=None, n_classes=1, bins=HISTOGRAM_BINS):
+    values = np.asarray(values, dtype='float64')
+    edges = histogram_edges(values, bins)
+    n_bins = len(edges) - 1
+    if classes is None:
+        classes = np.zeros(len(values), dtype=np.int64)
+    valid = ~np.isnan(values)
+    bin_index = np.clip(np.searchsorted(edges, values[valid], side='right') - 1, 0, n_bins - 1)
+    combined = np.asarray(classes)[valid].astype(np.int64) * n_bins + bin_index
+    counts = np.bincount(combined, minlength=n_classes * n_bins).reshape(n_classes, n_bins)
+    return edges, counts
+
+
+# Estadísticos de caja (cuartiles, bigotes de Tukey) y una muestra acotada de atípicos
+def box_summary(values, max_outliers=BOX_MAX_OUTLIERS, seed=SAMPLE_SEED):
+    values = _finite(values)
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    n_outliers = len(outliers)
+    if n_outliers > max_outliers:
+        rng = np.random.default_rng(seed)
+        outliers = rng.choice(outliers, size=max_outliers, replace=False)
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': values.mean(),
+        'lowerfence': inside.min(),
+        'upperfence': inside.max(),
+        'outliers': outliers,
+        'n_outliers': n_outliers,
+        'count': len(values),
+    }
+
+
+# Rejilla de densidad 2D por clase (rasterizado en el servidor, al estilo datashader)
+def density_grid(x, y, classes=None, n_classes=1, bins=DENSITY_BINS, x_range=None, y_range=None):
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if classes is None:
+        classes = np.zeros(len(x), dtype=np.int64)
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x, y, classes = x[valid], y[valid], np.asarray(classes)[valid].astype(np.int64)
+
+    edges = []
+    indexes = []
+    for values, value_range, n_bins in ((x, x_range, bins[0]), (y, y_range, bins[1])):
+        if value_range is None:
+            value_range = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+        low, high = value_range
+        if high <= low:
+            low, high = low - 0.5, high + 0.5
+        edges.append(np.linspace(low, high, n_bins + 1))
+        indexes.append(np.clip(((values - low) / (high - low) * n_bins).astype(np.int64), 0, n_bins - 1))
+
+    inside = np.ones(len(x), dtype=bool)
+    for values, edge in zip((x, y), edges):
+        inside &= (values >= edge[0]) & (values <= edge[-1])
+    ix, iy = indexes[0][inside], indexes[1][inside]
+    combined = (classes[inside] * bins[1] + iy) * bins[0] + ix
+    counts = np.bincount(combined, minlength=n_classes * bins[0] * bins[1]).reshape(n_classes, bins[1], bins[0])
+    return edges[0], edges[1], counts
@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregations import HISTOGRAM_BINS, histogram_counts
+from cleaning import DEFAULT_CATEGORIES, clean_portfolio
+from compact import frame_memory
+from correlation import CorrelationEngine
+from data_store import csv_to_parquet, read_parquet
+from filters import FilterIndex, default_ranges
+from ingestion import PortfolioState
+from kpi_cube import KPICube
+from score_cli import peak_rss_mb
+from scoring import train_model
+from synthetic import SYNTHETIC_SEED, fit_spec, write_synthetic
+
+BENCH_SIZES = [10_000, 100_000, 1_000_000]
+BENCH_DIR = os.path.join('.cache', 'bench')
+BASELINE_PATH = 'benchmark_baseline.json'
+REPORT_PATH = 'benchmark_report.json'
+REPEAT = 5
+
+# Una etapa regresa si tarda más de (1 + TOLERANCE) veces la línea base y al menos MIN_DELTA segundos más.
+# Los tiempos se normalizan con una carga de calibración fija medida en la misma corrida, así que
+# una máquina más lenta (o compartida) no se confunde con una regresión del código
+TOLERANCE = 0.5
+MIN_DELTA = 0.005
+
+# Lote de la etapa de ingesta incremental, como fracción de la cartera
+INGEST_FRACTION = 0.01
+
+# El Random Forest se entrena sobre una muestra acotada; el scoring recorre todas las filas
+TRAIN_MAX_ROWS = 100_000
+
+# Presupuestos del dashboard en segundos (absolutos, sin normalizar: es lo que espera el usuario).
+# cold_start: primera ejecución del script en un proceso nuevo (imports, carga de la versión y
+# primera página), con el almacén ya ingerido; rerun: mover un filtro con la sesión ya abierta
+# y el pool de cómputo ya caliente
+APP_SCRIPT = 'reporte_streamlit.py'
+APP_BUDGETS = {'cold_start': 3.0, 'rerun': 0.5}
+APP_RERUNS = 5
+
+# Se ejecuta en un intérprete nuevo por repetición para que ningún import ni caché quede caliente
+APP_PROBE = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+start = time.perf_counter()
+at.run()
+cold_start = time.perf_counter() - start
+# Los reruns se miden con la sesión asentada: el calentamiento del pool de cómputo corre en
+# segundo plano tras la primera página y, con un solo núcleo, compite con el script
+import gc
+pools = [obj for obj in gc.get_objects() if type(obj).__name__ == 'ComputePool']
+while any(pool.in_flight() for pool in pools):
+    time.sleep(0.05)
+reruns = []
+for i in range(int(sys.argv[2])):
+    at.sidebar.slider[0].set_value((25 + i, 60))
+    start = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({'cold_start': cold_start, 'rerun': min(reruns), 'exceptions': len(at.exception)}))
+'''
+
+# Estados de filtro representativos: sin filtro, una clase, rango estrecho y rango amplio
+FILTER_STATES = [
+    (None, (18, 100), (0, 10 ** 12)),
+    (1, (18, 100), (0, 10 ** 12)),
+    (None, (30, 32), (20_000_000, 30_000_000)),
+    (0, (25, 60), (10_000_000, 200_000_000)),
+]
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+# Carga de referencia: ordenamiento numpy más un bucle de Python, mezcla parecida al pipeline
+def calibrate(repeat=REPEAT):
+    values = np.random.default_rng(0).random(1_000_000)
+    seconds, _ = best_of(lambda: (np.sort(values), sum(range(1_000_000))), repeat)
+    return round(seconds, 6)
+
+
+# Mejor tiempo de varias repeticiones (el menos afectado por ruido del sistema)
+def best_of(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# Vista inicial del dashboard (rango casi completo: el slider de edad se corta en 65) sin la
+# caché de consultas, para medir la consulta y no el acierto en caché
+def default_view(filter_index, df):
+    filter_index.clear_cache()
+    view = filter_index.view(df, None, *default_ranges(filter_index.bounds))
+    return len(view)
+
+
+def synthetic_csv(rows, seed=SYNTHETIC_SEED, data_dir=BENCH_DIR, spec=None):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bankloan_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        write_synthetic(path, rows, spec or fit_spec(), seed)
+    return path
+
+
+def run_size(rows, repeat=REPEAT, seed=SYNTHETIC_SEED, data_dir=BENCH_DIR, spec=None):
+    csv_path = synthetic_csv(rows, seed, data_dir, spec)
+    store_path = os.path.splitext(csv_path)[0] + '.parquet'
+    stages = {}
+
+    def record(name, fn, n=rows, times=repeat):
+        seconds, result = best_of(fn, times)
+        stages[name] = {
+            'seconds': round(seconds, 6),
+            'rows': n,
+            'rows_per_sec': round(n / seconds, 1) if seconds > 0 else None,
+        }
+        return result
+
+    record('convert', lambda: csv_to_parquet(csv_path, store_path), times=1)
+    raw = record('load', lambda: read_parquet(store_path))
+    df, _ = record('preprocess', lambda: clean_portfolio(raw))
+
+    filter_index = record('filter_index', lambda: FilterIndex(df))
+    record('filter_query', lambda: [filter_index.view(df, *state)['income'] for state in FILTER_STATES])
+    record('filter_default_view', lambda: default_view(filter_index, df))
+    kpi_cube = record('kpi_cube', lambda: KPICube(df))
+    record('kpi_query', lambda: [kpi_cube.query(df, *state) for state in FILTER_STATES])
+    engine = record('correlation_engine', lambda: CorrelationEngine(df))
+    record('correlation_query', lambda: [engine.pearson(df, *state) for state in FILTER_STATES])
+    record('histogram', lambda: histogram_counts(
+        df['income'], df['default'], n_classes=len(DEFAULT_CATEGORIES), bins=HISTOGRAM_BINS
+    ))
+
+    # Lote nuevo sobre una versión con sus motores construidos: limpieza del lote y avance
+    # incremental (el estado base no se modifica, así que la etapa se puede repetir)
+    batch_rows = max(int(rows * INGEST_FRACTION), 1)
+    base = PortfolioState({'id': 'base'}, df.iloc[:len(df) - batch_rows].reset_index(drop=True), {})
+    base.filter_index, base.kpi_cube, base.sampler, base.correlation_engine
+    record('ingest_batch', lambda: base.advance(
+        {'id': 'lote'}, clean_portfolio(raw.iloc[len(raw) - batch_rows:].reset_index(drop=True))[0], {}
+    ), n=batch_rows)
+
+    model_dir = tempfile.mkdtemp(prefix='bench_model_')
+    try:
+        train_rows = min(rows, TRAIN_MAX_ROWS)
+        sample = df.sample(n=train_rows, random_state=seed) if train_rows < len(df) else df
+        model = record('train', lambda: train_model(sample, model_dir=model_dir), n=train_rows, times=1)
+        record('score', lambda: model.predict_proba(df), n=len(df))
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    own_rss, _ = peak_rss_mb()
+    return {'stages': stages, 'peak_rss_mb': round(own_rss, 1), 'bytes_per_row': frame_memory(df)['bytes_per_row']}
+
+
+# Mejor tiempo de arranque en frío y de rerun del dashboard sobre los datos del repositorio
+def run_app(script=APP_SCRIPT, repeat=REPEAT, reruns=APP_RERUNS):
+    probes = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', APP_PROBE, script, str(reruns)], capture_output=True, text=True, check=True
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        if probe['exceptions']:
+            raise RuntimeError(f"El dashboard terminó con {probe['exceptions']} excepciones")
+        probes.append(probe)
+    return {stage: round(min(probe[stage] for probe in probes), 6) for stage in APP_BUDGETS}
+
+
+def run(sizes=BENCH_SIZES, repeat=REPEAT, seed=SYNTHETIC_SEED, data_dir=BENCH_DIR):
+    spec = fit_spec()
+    calibration = calibrate(repeat)
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = run_size(rows, repeat, seed, data_dir, spec)
+    # La calibración se repite al final y se toma el mejor valor: cubre cambios de carga durante la corrida
+    calibration = min(calibration, calibrate(repeat))
+    return {'machine': machine_info(), 'seed': seed, 'repeat': repeat, 'calibration_seconds': calibration, 'results': results}
+
+
+# Etapas comparables entre el reporte y la línea base; las regresiones hacen fallar la ejecución
+def compare(report, baseline, tolerance=TOLERANCE, min_delta=MIN_DELTA):
+    rows = []
+    speed = report['calibration_seconds'] / baseline['calibration_seconds']
+    for size, result in report['results'].items():
+        base_stages = baseline.get('results', {}).get(size, {}).get('stages', {})
+        for stage, current in result['stages'].items():
+            if stage not in base_stages:
+                continue
+            base = base_stages[stage]['seconds']
+            ratio = current['seconds'] / (base * speed) if base > 0 else np.inf
+            rows.append({
+                'rows': int(size),
+                'stage': stage,
+                'baseline_s': base,
+                'current_s': current['seconds'],
+                'ratio': round(ratio, 3),
+                'regression': ratio > 1 + tolerance and current['seconds'] - base * speed > min_delta,
+            })
+    return pd.DataFrame(rows, columns=['rows', 'stage', 'baseline_s', 'current_s', 'ratio', 'regression'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline sobre carteras sintéticas")
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCH_SIZES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--data-dir', default=BENCH_DIR)
+    parser.add_argument('--output', default=REPORT_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--update-baseline', action='store_true', help="Guarda este reporte como nueva línea base")
+    parser.add_argument('--no-app', action='store_true', help="Omite la medición de arranque y rerun del dashboard")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, args.seed, args.data_dir)
+    if not args.no_app:
+        report['app'] = run_app(repeat=args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for size, result in report['results'].items():
+        stages = pd.DataFrame(result['stages']).T
+        print(f"\n{int(size):,} filas · RSS pico {result['peak_rss_mb']:.0f} MB · {result['bytes_per_row']:.1f} bytes/fila")
+        print(stages.to_string())
+
+    over_budget = []
+    for stage, seconds in report.get('app', {}).items():
+        ok = seconds <= APP_BUDGETS[stage]
+        over_budget += [] if ok else [stage]
+        print(f"{'✅' if ok else '❌'} Dashboard {stage}: {seconds * 1000:,.0f} ms (presupuesto {APP_BUDGETS[stage] * 1000:,.0f} ms)")
+
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"\n✅ Línea base actualizada en {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️ No hay línea base en {args.baseline}; usa --update-baseline para crearla")
+        return 1 if over_budget else 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    comparison = compare(report, baseline, args.tolerance)
+    speed = report['calibration_seconds'] / baseline['calibration_seconds']
+    print(f"\nCalibración: {speed:.2f}x el tiempo de la máquina de la línea base (ratio ya normalizado)")
+    print(comparison.to_string(index=False))
+    regressions = comparison[comparison['regression']]
+    if len(regressions):
+        print(f"\n❌ {len(regressions)} etapas más lentas que la línea base (tolerancia {args.tolerance:.0%})")
+        return 1
+    if over_budget:
+        print(f"\n❌ Dashboard fuera de presupuesto: {', '.join(over_budget)}")
+        return 1
+    print(f"\n✅ Sin regresiones frente a {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
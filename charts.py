@@ -0,0 +1,395 @@
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from aggregations import BOX_MAX_OUTLIERS, HISTOGRAM_BINS, box_summary, histogram_counts
+from cleaning import DEFAULT_CATEGORIES
+from correlation import CORRELATION_COLUMNS
+from scenarios import SHOCKS
+from scoring import RISK_SEGMENTS
+
+COLORES_DEFAULT = {'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'}
+ESCALA_DIVERGENTE = ['#ff6b6b', 'white', '#00f5ff']
+
+# Estilo común de todas las figuras (fondo transparente y texto blanco sobre el degradado de la app).
+# Se aplica como propiedades del layout y no como plantilla de plotly: Streamlit registra su propia
+# plantilla por defecto ('streamlit') y el tema del navegador se aplica sobre ella
+BASE_LAYOUT = dict(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='white', size=12)
+)
+
+NUMERIC_VARS = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt']
+SEGMENT_NAMES = {'age_segment': 'Edad', 'income_segment': 'Ingresos', 'creddebt_segment': 'Deuda de Crédito'}
+
+
+# Constructores de figuras sin dependencias de Streamlit: los usan el dashboard,
+# el warm-up de la caché y el generador de reportes estáticos
+def default_distribution_figure(filtered_df):
+    # Distribución de defaults con colores personalizados
+    default_distribution = filtered_df['default_label'].value_counts()
+    fig_default = px.pie(
+        values=default_distribution.values,
+        names=default_distribution.index,
+        title="Distribución de Préstamos",
+        color=default_distribution.index,
+        color_discrete_map=COLORES_DEFAULT
+    )
+    fig_default.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
+    fig_default.update_layout(BASE_LAYOUT)
+    return fig_default
+
+
+def income_distribution_figure(filtered_df):
+    # Distribución de ingresos (bins calculados en el servidor)
+    edges, counts = histogram_counts(filtered_df['income'], bins=HISTOGRAM_BINS)
+    fig_income = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts[0],
+        width=np.diff(edges),
+        marker_color='#00f5ff'
+    ))
+    fig_income.update_layout(
+        BASE_LAYOUT,
+        title='Distribución de Ingresos',
+        xaxis_title="Ingresos",
+        yaxis_title="Frecuencia"
+    )
+    return fig_income
+
+
+def overview_figures(filtered_df):
+    return {
+        'default': default_distribution_figure(filtered_df),
+        'income': income_distribution_figure(filtered_df),
+    }
+
+
+# Histograma por bin y clase de default y resumen del box plot para una variable
+def numeric_aggregates(filtered_df, selected_var):
+    edges, counts = histogram_counts(
+        filtered_df[selected_var], filtered_df['default'],
+        n_classes=len(DEFAULT_CATEGORIES), bins=HISTOGRAM_BINS
+    )
+    values = filtered_df[selected_var].to_numpy(dtype='float64', na_value=np.nan)
+    codes = filtered_df['default'].to_numpy()
+    summaries = [
+        box_summary(values[codes == code], max_outliers=BOX_MAX_OUTLIERS)
+        for code in range(len(DEFAULT_CATEGORIES))
+    ]
+    return edges, counts, summaries
+
+
+# Barras superpuestas por estado del préstamo; counts[código] ya viene agregado por bin
+def class_histogram_figure(edges, counts, title, xaxis_title, yaxis_title='count', classes=None, legend_title='default_label'):
+    classes = enumerate(DEFAULT_CATEGORIES) if classes is None else classes
+    fig_hist = go.Figure()
+    for code, label in classes:
+        fig_hist.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts[code],
+            width=np.diff(edges),
+            name=label,
+            marker_color=COLORES_DEFAULT[label],
+            opacity=0.7
+        ))
+    fig_hist.update_layout(
+        BASE_LAYOUT,
+        title=title,
+        barmode='overlay',
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        legend_title_text=legend_title
+    )
+    return fig_hist
+
+
+# Box plot con cuartiles y bigotes precalculados; solo una muestra acotada de atípicos
+def box_figure(summaries, selected_var, title):
+    fig_box = go.Figure()
+    for label, summary in summaries:
+        if summary is None:
+            continue
+        fig_box.add_trace(go.Box(
+            x=[label],
+            q1=[summary['q1']],
+            median=[summary['median']],
+            q3=[summary['q3']],
+            lowerfence=[summary['lowerfence']],
+            upperfence=[summary['upperfence']],
+            name=label,
+            marker_color=COLORES_DEFAULT[label]
+        ))
+        if len(summary.get('outliers', [])):
+            fig_box.add_trace(go.Scatter(
+                x=[label] * len(summary['outliers']),
+                y=summary['outliers'],
+                mode='markers',
+                marker=dict(color=COLORES_DEFAULT[label], size=4),
+                name=label,
+                showlegend=False
+            ))
+    fig_box.update_layout(
+        BASE_LAYOUT,
+        title=title,
+        xaxis_title='default_label',
+        yaxis_title=selected_var
+    )
+    return fig_box
+
+
+def numeric_figures(edges, counts, summaries, selected_var):
+    return {
+        'histogram': class_histogram_figure(edges, counts, f'Distribución de {selected_var}', selected_var),
+        'box': box_figure(zip(DEFAULT_CATEGORIES, summaries), selected_var, f'Box Plot de {selected_var}'),
+    }
+
+
+def correlation_frame(matrix):
+    return pd.DataFrame(matrix, index=CORRELATION_COLUMNS, columns=CORRELATION_COLUMNS)
+
+
+def correlation_figures(corr_matrix):
+    fig_corr = px.imshow(
+        corr_matrix.round(2),
+        title="Matriz de Correlación",
+        aspect="auto",
+        color_continuous_scale=ESCALA_DIVERGENTE,
+        text_auto=True# Mostrar valores en las celdas
+    )
+    fig_corr.update_layout(
+        BASE_LAYOUT,
+        font=dict(size=10)
+    )
+    fig_corr.update_traces(
+        textfont=dict(color='black', size=10)
+    )
+
+    # Correlación con default
+    default_corr = corr_matrix['default'].drop('default').sort_values(key=abs, ascending=False)
+    fig_default_corr = px.bar(
+        x=default_corr.index,
+        y=default_corr.values.round(2),
+        title='Correlación con Default',
+        color=default_corr.values,
+        color_continuous_scale=ESCALA_DIVERGENTE,
+    )
+    fig_default_corr.update_layout(
+        BASE_LAYOUT,
+        xaxis_title="Variables",
+        yaxis_title="Correlación"
+    )
+    return {'matrix': fig_corr, 'default': fig_default_corr}
+
+
+def education_figure(filtered_df):
+    # Distribución por educación
+    ed_distribution = filtered_df['ed'].value_counts().sort_index()
+    fig_ed = px.bar(
+        x=ed_distribution.index.astype(str),
+        y=ed_distribution.values,
+        title='Distribución por Nivel Educativo',
+        color=ed_distribution.values,
+        color_continuous_scale=ESCALA_DIVERGENTE
+    )
+    fig_ed.update_layout(BASE_LAYOUT)
+    return fig_ed
+
+
+def income_debt_points_figure(points):
+    fig_scatter = px.scatter(
+        points,
+        x='income',
+        y='debtinc',
+        color='default_label',
+        title='Ingresos vs Ratio de Deuda',
+        color_discrete_map=COLORES_DEFAULT,
+        opacity=0.7
+    )
+    fig_scatter.update_layout(BASE_LAYOUT)
+    return fig_scatter
+
+
+def income_debt_density_figure(x_edges, y_edges, counts):
+    fig_scatter = go.Figure()
+    for code, label in enumerate(DEFAULT_CATEGORIES):
+        # Conteos con el entero sin signo más pequeño posible: payload de pocos KB
+        density = counts[code].astype(np.min_scalar_type(counts.max()))
+        fig_scatter.add_trace(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=density,
+            hovertemplate='income=%{x:,.0f}<br>debtinc=%{y:,.0f}<br>préstamos=%{z:,.0f}<extra>' + label + '</extra>',
+            colorscale=[[0, 'rgba(0,0,0,0)'], [1, COLORES_DEFAULT[label]]],
+            zmin=0,
+            showscale=False,
+            opacity=0.7,
+            name=label,
+            showlegend=True
+        ))
+    fig_scatter.update_layout(
+        BASE_LAYOUT,
+        title='Ingresos vs Ratio de Deuda (densidad)',
+        xaxis_title='income',
+        yaxis_title='debtinc',
+        legend_title_text='default_label'
+    )
+    return fig_scatter
+
+
+def scatter_3d_figure(sample):
+    fig_3d = px.scatter_3d(
+        sample,
+        x='age',
+        y='income',
+        z='debtinc',
+        color='default_label',
+        title='Análisis 3D: Edad, Ingresos, Deuda',
+        color_discrete_map=COLORES_DEFAULT,
+        opacity=0.7
+    )
+    fig_3d.update_layout(
+        BASE_LAYOUT,
+        scene=dict(
+            bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white'),
+            yaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white'),
+            zaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white')
+        )
+    )
+    return fig_3d
+
+
+def missing_values_figure(missing_df):
+    fig_missing = px.bar(
+        missing_df,
+        x=missing_df.index,
+        y='Porcentaje',
+        title='Valores Faltantes (%)',
+        color='Porcentaje',
+        color_continuous_scale='Reds'
+    )
+    fig_missing.update_layout(BASE_LAYOUT)
+    return fig_missing
+
+
+def scoring_figures(scores, codes, segments):
+    # Distribución de la probabilidad estimada por estado real del préstamo
+    edges, counts = histogram_counts(scores, codes, n_classes=len(DEFAULT_CATEGORIES), bins=20)
+    fig_scores = class_histogram_figure(
+        edges, counts, 'Probabilidad de Default Estimada', 'Probabilidad de default', 'Frecuencia', legend_title=None
+    )
+
+    # Clientes por segmento de riesgo
+    segment_counts = pd.Series(segments).value_counts().reindex(RISK_SEGMENTS, fill_value=0)
+    fig_segments = px.bar(
+        x=segment_counts.index,
+        y=segment_counts.values,
+        title='Clientes por Segmento de Riesgo',
+        color=segment_counts.index,
+        color_discrete_sequence=['#00f5ff', '#ffd166', '#ff6b6b']
+    )
+    fig_segments.update_layout(
+        BASE_LAYOUT,
+        xaxis_title="Segmento",
+        yaxis_title="Clientes",
+        showlegend=False
+    )
+    return {'scores': fig_scores, 'segments': fig_segments}
+
+
+# Distribución de la tasa de default entre escenarios y sensibilidad a cada choque
+def scenario_figures(results, baseline):
+    rates = results['Tasa de Default'] * 100
+    fig_distribution = go.Figure(go.Histogram(x=rates, nbinsx=30, marker_color='#ff00f5', opacity=0.8))
+    fig_distribution.add_vline(
+        x=baseline['Tasa de Default'] * 100, line_dash='dash', line_color='#00f5ff',
+        annotation_text='Sin choques', annotation_font_color='#00f5ff'
+    )
+    fig_distribution.update_layout(
+        BASE_LAYOUT,
+        title='Tasa de Default Estimada por Escenario',
+        xaxis_title="Tasa de default (%)",
+        yaxis_title="Escenarios"
+    )
+
+    fig_sensitivity = go.Figure()
+    for (col, label), color in zip(SHOCKS.items(), ['#00f5ff', '#ffd166', '#ff6b6b']):
+        if results[col].nunique() < 2:
+            continue
+        fig_sensitivity.add_trace(go.Scatter(
+            x=results[col] * 100, y=rates, mode='markers', name=label,
+            marker=dict(color=color, size=6, opacity=0.7),
+            hovertemplate=f'{label}: %{{x:+.1f}}%<br>Tasa: %{{y:.2f}}%<extra></extra>'
+        ))
+    fig_sensitivity.update_layout(
+        BASE_LAYOUT,
+        title='Sensibilidad de la Tasa de Default a cada Choque',
+        xaxis_title="Choque (%)",
+        yaxis_title="Tasa de default (%)"
+    )
+    return {'distribution': fig_distribution, 'sensitivity': fig_sensitivity}
+
+
+# Tasa de default con intervalo de confianza de Wilson (95%)
+def segment_rate_figure(table, segment):
+    fig_rate = go.Figure(go.Bar(
+        x=table.index,
+        y=table['Tasa_Default'] * 100,
+        error_y=dict(
+            type='data',
+            symmetric=False,
+            array=(table['IC_Superior'] - table['Tasa_Default']) * 100,
+            arrayminus=(table['Tasa_Default'] - table['IC_Inferior']) * 100
+        ),
+        marker_color='#ff6b6b',
+        customdata=table['Total_Casos'],
+        hovertemplate='%{x}<br>Tasa: %{y:.1f}%<br>Casos: %{customdata:,}<extra></extra>'
+    ))
+    fig_rate.update_layout(
+        BASE_LAYOUT,
+        title=f'Tasa de Default por {SEGMENT_NAMES[segment]} (IC 95%)',
+        xaxis_title="Segmento",
+        yaxis_title="Tasa de default (%)"
+    )
+    return fig_rate
+
+
+def segment_crosstab_figure(crosstab, pair):
+    rates = crosstab['Tasa_Default'].unstack() * 100
+    cases = crosstab['Total_Casos'].unstack()
+    fig_cross = go.Figure(go.Heatmap(
+        z=rates.to_numpy(),
+        x=list(rates.columns),
+        y=list(rates.index),
+        customdata=cases.to_numpy(),
+        colorscale='RdYlBu_r',
+        hovertemplate='%{y} | %{x}<br>Tasa: %{z:.1f}%<br>Casos: %{customdata:,}<extra></extra>'
+    ))
+    fig_cross.update_layout(
+        BASE_LAYOUT,
+        title=f'Tasa de Default (%): {SEGMENT_NAMES[pair[0]]} × {SEGMENT_NAMES[pair[1]]}',
+        xaxis_title=SEGMENT_NAMES[pair[1]],
+        yaxis_title=SEGMENT_NAMES[pair[0]]
+    )
+    return fig_cross
+
+
+def figures_to_json(figures):
+    return '{' + ','.join(f"{json.dumps(name)}:{fig.to_json()}" for name, fig in figures.items()) + '}'
+
+
+def figures_from_json(text):
+    return {name: go.Figure(spec) for name, spec in json.loads(text).items()}
+
+
+# Figuras serializadas en la caché compartida: se construyen una vez por versión y filtros
+def cached_figures(cache, key, build, *args):
+    text = cache.get_figure(key)
+    if text is None:
+        text = cache.put_figure(key, figures_to_json(build(*args)))
+    return figures_from_json(text)
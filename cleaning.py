@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from compact import compact_frame
+
+# Mapeo de etiquetas crudas de default (igual que en el notebook)
+MAPEO_VALORES = {'0': 0, '1': 1, "'0'": 0, ":0": 0}
+ETIQUETAS_CANONICAS = ('0', '1')
+
+DEFAULT_CATEGORIES = ['Aprobado', 'No Aprobado']
+
+# Rangos plausibles por columna; lo que caiga fuera se reporta, no se modifica
+RANGOS_VALIDOS = {
+    'age': (18, 100),
+    'ed': (1, 5),
+    'employ': (0, 70),
+    'address': (0, 100),
+    'income': (0, None),
+    'debtinc': (0, None),
+    'creddebt': (0, None),
+    'othdebt': (0, None),
+}
+
+
+# Códigos de default (0/1, -1 si no se puede mapear) y conteo de etiquetas crudas.
+# Las cadenas se procesan una vez por categoría, nunca por fila.
+def default_codes(series):
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        codes = np.where(np.isin(values, (0, 1)), values, -1).astype(np.int8)
+        return codes, {}
+
+    labels = pd.Categorical(series)
+    categories = labels.categories.astype(str).str.strip()
+    lookup = np.array([MAPEO_VALORES.get(c, -1) for c in categories] + [-1], dtype=np.int8)
+    codes = lookup[labels.codes]
+
+    counts = np.bincount(labels.codes[labels.codes >= 0], minlength=len(categories))
+    raw_counts = {}
+    for label, count in zip(categories, counts):
+        if count:
+            raw_counts[label] = raw_counts.get(label, 0) + int(count)
+    return codes, raw_counts
+
+
+def merge_label_counts(total, counts):
+    for label, count in counts.items():
+        total[label] = total.get(label, 0) + count
+    return total
+
+
+# Reporte de validación de varios lotes limpiados por separado (p. ej. particiones del almacén)
+def merge_reports(reports):
+    merged = {
+        'rows': 0, 'malformed_labels': {}, 'unknown_labels': {}, 'missing_default': 0,
+        'malformed_values': {}, 'nan_counts': {}, 'out_of_range': {}, 'dropped_rows': 0,
+    }
+    for report in reports:
+        for field, value in report.items():
+            if isinstance(value, dict):
+                merge_label_counts(merged[field], value)
+            else:
+                merged[field] += value
+    return merged
+
+
+def _out_of_range(df):
+    result = {}
+    for col, (low, high) in RANGOS_VALIDOS.items():
+        if col not in df.columns:
+            continue
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        mask = np.zeros(len(values), dtype=bool)
+        if low is not None:
+            mask |= values < low
+        if high is not None:
+            mask |= values > high
+        count = int(mask.sum())
+        if count:
+            result[col] = count
+    return result
+
+
+# Limpieza idempotente del portafolio: devuelve un frame nuevo y un reporte de validación
+def clean_portfolio(df):
+    codes, raw_counts = default_codes(df['default'])
+    # Un almacén Parquet ya trae default como bool; las etiquetas crudas viajan en attrs
+    raw_counts = raw_counts or dict(df.attrs.get('default_labels', {}))
+
+    report = {
+        'rows': len(df),
+        'malformed_labels': {
+            label: count for label, count in raw_counts.items()
+            if label in MAPEO_VALORES and label not in ETIQUETAS_CANONICAS
+        },
+        'unknown_labels': {
+            label: count for label, count in raw_counts.items() if label not in MAPEO_VALORES
+        },
+        'missing_default': int(df['default'].isna().sum()),
+        # Valores que la conversión a Parquet dejó nulos: no numéricos o con decimales en una
+        # columna entera (malformados) y enteros que no caben en su tipo (fuera de rango)
+        'malformed_values': dict(df.attrs.get('malformed_values', {})),
+        'nan_counts': {col: int(n) for col, n in df.isna().sum().items() if n},
+        'out_of_range': merge_label_counts(_out_of_range(df), df.attrs.get('overflow_values', {})),
+    }
+
+    valid = codes >= 0
+    report['dropped_rows'] = int((~valid).sum())
+
+    # Modelo compacto: enteros del menor ancho exacto (nullable si hay nulos), código de
+    # default en int8 y etiqueta categórica de 1 byte por fila
+    clean = compact_frame(df, [col for col in RANGOS_VALIDOS if col in df.columns]).assign(
+        default=codes,
+        default_label=pd.Categorical.from_codes(np.where(valid, codes, 0), categories=DEFAULT_CATEGORIES),
+    )
+    if report['dropped_rows']:
+        clean = clean[valid].reset_index(drop=True)
+    return clean, report
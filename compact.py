@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Enteros candidatos de menor a mayor ancho; se elige el primero que contiene el rango observado
+INTEGER_DTYPES = ['uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32', 'int64']
+
+# Equivalente nullable de pandas (máscara de 1 byte por fila) para columnas con nulos
+NULLABLE_DTYPES = {
+    'uint8': 'UInt8', 'int8': 'Int8', 'uint16': 'UInt16', 'int16': 'Int16',
+    'uint32': 'UInt32', 'int32': 'Int32', 'int64': 'Int64',
+}
+
+
+# Posiciones de fila en 32 bits mientras el portafolio quepa (la mitad que int64)
+def position_dtype(size):
+    return np.int32 if size < np.iinfo(np.int32).max else np.int64
+
+
+# Entero más pequeño que representa exactamente la columna; None si no es entera.
+# Los montos en COP son enteros y caben en 32 bits, así que no hace falta escalarlos
+def compact_dtype(series):
+    dtype = series.dtype
+    if not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return None
+    nulls = int(series.isna().sum())
+    if nulls == len(series):
+        low, high = 0, 0
+    else:
+        low, high = series.min(), series.max()
+        # Los enteros ya son exactos; un float solo se compacta si todos sus valores son enteros
+        if not pd.api.types.is_integer_dtype(dtype):
+            values = series.to_numpy(dtype='float64', na_value=np.nan)
+            if not np.all(np.isnan(values) | (values == np.round(values))):
+                return None
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return NULLABLE_DTYPES[dtype] if nulls else dtype
+    return None
+
+
+def compact_frame(df, columns=None):
+    converted = {}
+    for col in columns or df.columns:
+        series = df[col]
+        dtype = compact_dtype(series)
+        if dtype is not None and dtype != str(series.dtype):
+            converted[col] = series.astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+# Valores en el dtype compacto de la columna (nulos en 0) y máscara de presentes
+def native_values(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, 'numpy_dtype'):
+        present = ~series.isna().to_numpy()
+        return series.to_numpy(dtype=dtype.numpy_dtype, na_value=0), present
+    values = series.to_numpy()
+    if values.dtype.kind == 'f':
+        return values, ~np.isnan(values)
+    return values, np.ones(len(values), dtype=bool)
+
+
+# Bytes por fila del frame (incluye máscaras de nulos y categorías)
+def frame_memory(df):
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    return {
+        'bytes': int(usage.sum()),
+        'bytes_per_row': round(float(usage.sum()) / rows, 1),
+        'columns': {col: round(float(n) / rows, 2) for col, n in usage.items()},
+    }
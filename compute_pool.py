@@ -0,0 +1,238 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from aggregations import DENSITY_BINS, density_grid
+from cleaning import DEFAULT_CATEGORIES
+from ingestion import PORTFOLIO_DIR, PortfolioStore
+from profiling import file_hash
+from sampling import SAMPLE_SIZE
+from scenarios import ScenarioEngine, sample_shocks
+from scoring import META_FILE, MODEL_DIR, RISK_SEGMENTS, load_model, risk_segment
+
+# Procesos del pool: se deja un núcleo libre para el servidor de Streamlit, con un tope porque
+# cada proceso carga su propia copia de la versión (frame e índices) y la memoria residente crece
+# a (procesos + 1) copias del portafolio contando la del servidor
+POOL_MAX_WORKERS = 2
+POOL_WORKERS = max(1, min(POOL_MAX_WORKERS, (os.cpu_count() or 1) - 1))
+
+# Resultados terminados que se conservan para repetir una consulta sin recalcular
+RESULT_CACHE_SIZE = 256
+
+# Secciones que usan el modelo persistido: su resultado depende también de la versión del modelo
+MODEL_SECTIONS = ('scoring', 'scenarios')
+
+# Cada cuánto la sesión que espera un resultado refresca su marcador (y atiende un rerun)
+POLL_SECONDS = 0.25
+
+# Estado de cada proceso del pool: almacén (con sus versiones recientes en memoria) y modelo
+_worker = {}
+
+
+def _init_worker(store_dir, model_dir):
+    _worker.clear()
+    _worker.update({'store': PortfolioStore(store_dir), 'model_dir': model_dir})
+
+
+# El modelo se recarga cuando cambia la huella de sus metadatos (se reentrenó y se guardó otro)
+def _risk_model():
+    if 'model' not in _worker or _worker['model_hash'] != _worker['job_model_hash']:
+        _worker['model'] = load_model(_worker['model_dir'])
+        _worker['model_hash'] = _worker['job_model_hash']
+    return _worker['model']
+
+
+# charts (y con él plotly) se importa en el primer trabajo que lo usa, no al importar el módulo:
+# la app importa compute_pool al arrancar y no debe cargar plotly antes de pintar la primera vista
+def numeric_job(state, view, selected_var):
+    from charts import numeric_aggregates
+    return numeric_aggregates(view, selected_var)
+
+
+def correlation_job(state, view, method):
+    from charts import correlation_frame
+    if method == "Pearson":
+        matrix = state.correlation_engine.pearson(state.df, *view.filters)
+    else:
+        matrix = state.rank_cache.spearman(view.positions)
+    return correlation_frame(matrix)
+
+
+def density_job(state, view, x_range, y_range):
+    return density_grid(
+        view['income'].to_numpy(dtype='float64', na_value=np.nan),
+        view['debtinc'].to_numpy(dtype='float64', na_value=np.nan),
+        view['default'].to_numpy(), n_classes=len(DEFAULT_CATEGORIES),
+        bins=DENSITY_BINS, x_range=x_range, y_range=y_range
+    )
+
+
+def sample_3d_job(state, view):
+    return state.sampler.sample(state.df, *view.filters, size=SAMPLE_SIZE)
+
+
+# Solo viajan los agregados y las figuras serializadas, no los scores de cada fila
+def scoring_job(state, view):
+    from charts import figures_to_json, scoring_figures
+    scores = state.scores(_risk_model())
+    if view.positions is not None:
+        scores = scores[view.positions]
+    segments = risk_segment(scores)
+    return {
+        'mean': float(scores.mean()) if len(scores) else None,
+        'high_risk': int((segments == RISK_SEGMENTS[-1]).sum()),
+        'figures': figures_to_json(scoring_figures(scores, view['default'].to_numpy(), segments)),
+    }
+
+
+def segments_job(state, view):
+    return state.segment_engine.query(view.positions, key=view.filters)
+
+
+def scenarios_job(state, view, ranges, n_scenarios):
+    engine = ScenarioEngine(_risk_model(), state.df, view.positions)
+    return engine.baseline(), engine.run(sample_shocks(dict(ranges), n_scenarios)), engine.rows, len(engine.X)
+
+
+# Carga la versión en el proceso que lo ejecuta: el primer trabajo real no paga la lectura
+def warm_job(state, view):
+    return state.version_id
+
+
+# Trabajos por sección: reciben el estado de la versión, la vista filtrada y los widgets de la sección
+JOBS = {
+    'numeric': numeric_job,
+    'correlation': correlation_job,
+    'density': density_job,
+    'sample_3d': sample_3d_job,
+    'scoring': scoring_job,
+    'segments': segments_job,
+    'scenarios': scenarios_job,
+    'warm': warm_job,
+}
+
+
+def run_job(section, data_hash, filters, params, model_hash=None):
+    _worker['job_model_hash'] = model_hash
+    state = _worker['store'].state(data_hash)
+    view = state.filter_index.view(state.df, *filters) if filters is not None else None
+    return JOBS[section](state, view, **dict(params))
+
+
+# Trabajo enviado por una sesión; varias sesiones pueden compartir el mismo futuro
+class Ticket:
+    def __init__(self, key, future):
+        self.key = key
+        self.future = future
+        self.released = False
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+# Capa de cómputo fuera del hilo del script: los agregados pesados corren en procesos aparte
+# (sin competir por el GIL con las demás sesiones), los envíos iguales se deduplican por
+# (sección, versión de datos, filtros, widgets, versión del modelo) y un trabajo en cola que ya
+# nadie espera se cancela
+class ComputePool:
+    def __init__(self, store_dir=PORTFOLIO_DIR, model_dir=MODEL_DIR, workers=POOL_WORKERS,
+                 cache_size=RESULT_CACHE_SIZE):
+        self.store_dir = store_dir
+        self.model_dir = model_dir
+        self.workers = workers
+        self.cache_size = cache_size
+        self._executor = None
+        self._jobs = {}
+        self._results = OrderedDict()
+        # Reentrante: cancelar un futuro ejecuta su callback (_finish) en el mismo hilo
+        self._lock = threading.RLock()
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'cached': 0, 'cancelled': 0, 'failed': 0}
+
+    # Procesos creados con spawn: hacer fork de un servidor con hilos no es seguro
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(self.store_dir, self.model_dir)
+            )
+        return self._executor
+
+    # Huella de los metadatos del modelo persistido, como report.input_hash
+    def model_hash(self):
+        path = os.path.join(self.model_dir, META_FILE)
+        return file_hash(path) if os.path.exists(path) else None
+
+    def submit(self, section, data_hash, filters, **params):
+        model_hash = self.model_hash() if section in MODEL_SECTIONS else None
+        key = (section, data_hash, filters, tuple(sorted(params.items())), model_hash)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.stats['cached'] += 1
+                future = Future()
+                future.set_result(self._results[key])
+                return Ticket(key, future)
+            if key in self._jobs:
+                self.stats['deduplicated'] += 1
+                self._jobs[key][1] += 1
+                return Ticket(key, self._jobs[key][0])
+
+            try:
+                future = self._get_executor().submit(run_job, section, data_hash, filters, key[3], model_hash)
+            except BrokenProcessPool:
+                # Un worker murió (p. ej. sin memoria): se descarta el pool y se crea otro
+                self._executor = None
+                future = self._get_executor().submit(run_job, section, data_hash, filters, key[3], model_hash)
+            self.stats['submitted'] += 1
+            self._jobs[key] = [future, 1]
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return Ticket(key, future)
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._jobs.get(key, [None])[0] is future:
+                del self._jobs[key]
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.stats['failed'] += 1
+                return
+            self._results[key] = future.result()
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+    # La sesión deja de esperar (terminó o un rerun la adelantó): si nadie más espera un trabajo
+    # que sigue en cola, se cancela; uno que ya corre termina y su resultado queda en la caché
+    def release(self, tickets):
+        with self._lock:
+            for ticket in tickets:
+                if ticket.released:
+                    continue
+                ticket.released = True
+                entry = self._jobs.get(ticket.key)
+                if entry is None or entry[0] is not ticket.future:
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0 and ticket.future.cancel():
+                    self._jobs.pop(ticket.key, None)
+                    self.stats['cancelled'] += 1
+
+    # Arranca un proceso del pool y le carga la versión sin que nadie espere: el trabajo no se
+    # libera, así que no se cancela, y al terminar queda en la caché (repetirlo no cuesta nada)
+    def warm(self, data_hash):
+        return self.submit('warm', data_hash, None)
+
+    def wait(self, tickets, timeout):
+        wait([ticket.future for ticket in tickets], timeout=timeout, return_when=FIRST_COMPLETED)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._jobs)
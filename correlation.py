@@ -0,0 +1,200 @@
+import numpy as np
+
+from kpi_cube import INCOME_BINS, BucketGrid
+
+CORRELATION_COLUMNS = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt', 'default']
+
+STAT_FIELDS = ('n', 'mean', 'm2', 'comoment')
+
+# Tipos de los estadísticos guardados por celda: n es un conteo exacto y el resto se guarda en
+# float32 (error relativo ~1e-7, muy por debajo de los dos decimales del heatmap); las fusiones
+# se hacen en float64
+CELL_TYPES = {'n': np.uint32, 'mean': np.float32, 'm2': np.float32, 'comoment': np.float32}
+
+
+def _matrix(df, columns):
+    return np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan) for col in columns])
+
+
+# Estadísticos suficientes y fusionables para Pearson con eliminación por pares.
+# Para cada par (i, j) se guardan n, la media de i sobre las filas donde i y j existen,
+# el M2 de i sobre esas filas y el co-momento; la fusión es la de Chan, estable numéricamente.
+class CorrelationStats:
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+
+    @classmethod
+    def from_array(cls, values):
+        values = np.asarray(values, dtype='float64')
+        stats = cls(values.shape[1])
+        if len(values) == 0:
+            return stats
+        present = ~np.isnan(values)
+        mask = present.astype('float64')
+        # Centrar por la media del bloque evita la cancelación con montos del orden de 1e8
+        counts = present.sum(axis=0)
+        shift = np.where(counts > 0, np.where(present, values, 0.0).sum(axis=0) / np.maximum(counts, 1), 0.0)
+        centered = np.where(present, values - shift, 0.0)
+
+        n = mask.T @ mask
+        mean = (centered.T @ mask) / np.maximum(n, 1)
+        stats.n = n
+        stats.mean = mean + shift[:, None]
+        stats.m2 = (centered ** 2).T @ mask - n * mean ** 2
+        stats.comoment = centered.T @ centered - n * mean * mean.T
+        return stats
+
+    # Fusión de muchos grupos a la vez (arrays apilados en el primer eje)
+    @classmethod
+    def combine(cls, n, mean, m2, comoment):
+        stats = cls(n.shape[-1])
+        if len(n) == 0:
+            return stats
+        total = n.sum(axis=0)
+        grand = (n * mean).sum(axis=0) / np.maximum(total, 1)
+        delta = mean - grand
+        stats.n = total
+        stats.mean = grand
+        stats.m2 = m2.sum(axis=0) + (n * delta ** 2).sum(axis=0)
+        stats.comoment = comoment.sum(axis=0) + (n * delta * np.swapaxes(delta, -1, -2)).sum(axis=0)
+        return stats
+
+    def merge(self, other):
+        return CorrelationStats.combine(*(np.stack([getattr(self, f), getattr(other, f)]) for f in STAT_FIELDS))
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def pearson(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr[(self.n < 2) | ~np.isfinite(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+# Estadísticos por celda de la rejilla de filtros (default x edad x ingresos). Una consulta
+# fusiona las celdas dentro del rango en O(celdas·k²) y solo recorre las filas de las celdas
+# que el borde del rango corta. Las posiciones se refieren al frame que se pasa en cada consulta.
+# La rejilla puede ser la del cubo de KPIs (grid) para no asignar las filas dos veces.
+class CorrelationEngine:
+    def __init__(self, df, columns=CORRELATION_COLUMNS, income_bins=INCOME_BINS, grid=None):
+        self.columns = list(columns)
+        self.grid = grid or BucketGrid(df, income_bins)
+        k = len(self.columns)
+        # Solo las celdas con filas tienen estadísticos (buena parte de la rejilla queda vacía);
+        # slots da la fila de cada celda en los arrays de estadísticos, -1 si aún no tiene
+        self.slots = np.full(self.grid.n_cells, -1, dtype=np.int32)
+        self.cells = {f: np.zeros((0, k, k), dtype=CELL_TYPES[f]) for f in STAT_FIELDS}
+        self.size = 0
+        self._fold(df, self.grid.positions, self.grid.cells)
+
+    def _fold(self, df, positions, cells):
+        values = _matrix(df, self.columns)
+        local = positions - self.size
+        self.size += len(df)
+        order = np.argsort(cells, kind='stable')
+        cells, local = cells[order], local[order]
+        bounds = np.flatnonzero(np.diff(cells)) + 1
+        new = np.unique(cells[self.slots[cells] < 0])
+        if len(new):
+            used = len(self.cells[STAT_FIELDS[0]])
+            self.slots[new] = np.arange(used, used + len(new))
+            k = len(self.columns)
+            for f in STAT_FIELDS:
+                self.cells[f] = np.concatenate([self.cells[f], np.zeros((len(new), k, k), dtype=CELL_TYPES[f])])
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(cells)]):
+            if start == stop:
+                continue
+            cell = self.slots[cells[start]]
+            batch = CorrelationStats.from_array(values[local[start:stop]])
+            current = CorrelationStats(len(self.columns))
+            for f in STAT_FIELDS:
+                setattr(current, f, self.cells[f][cell].astype('float64'))
+            merged = current.merge(batch)
+            for f in STAT_FIELDS:
+                self.cells[f][cell] = getattr(merged, f)
+
+    # Nuevo lote de préstamos (filas añadidas al final del frame): solo cambian sus celdas
+    def add_batch(self, batch):
+        offset = self.size
+        cells, positions = self.grid.extend(batch, offset)
+        self._fold(batch, positions, cells)
+
+    def query(self, df, default_value, age_range, income_range):
+        full, cells = self.grid.select(default_value, age_range, income_range)
+        inside = self.slots[np.flatnonzero(full & (self.grid.counts > 0))]
+        total = CorrelationStats.combine(*(self.cells[f][inside].astype('float64') for f in STAT_FIELDS))
+
+        if len(cells):
+            positions = np.sort(self.grid.positions[self.grid.rows_in(cells)])
+            age = df['age'].iloc[positions].to_numpy(dtype='float64', na_value=np.nan)
+            income = df['income'].iloc[positions].to_numpy(dtype='float64', na_value=np.nan)
+            keep = (age >= age_range[0]) & (age <= age_range[1]) & (income >= income_range[0]) & (income <= income_range[1])
+            rows = _matrix(df.iloc[positions[keep]], self.columns)
+            total = total.merge(CorrelationStats.from_array(rows))
+        return total
+
+    def pearson(self, df, default_value, age_range, income_range):
+        return self.query(df, default_value, age_range, income_range).pearson()
+
+
+# Código de grupo de empates por fila y columna (el rango denso del valor), calculado una vez
+# en el entero más chico que lo contiene. El Spearman de un subconjunto se obtiene contando
+# sus filas por grupo en O(n), sin volver a ordenar ni guardar el orden de cada columna
+class RankCache:
+    def __init__(self, df, columns=CORRELATION_COLUMNS):
+        self.columns = list(columns)
+        self.size = len(df)
+        self.codes, self.n_groups, self.has_nan = {}, {}, {}
+        for col in self.columns:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            present = ~np.isnan(values)
+            groups, codes = np.unique(values[present], return_inverse=True)
+            # Los nulos llevan el código n_groups, fuera de todos los grupos
+            self.codes[col] = np.full(self.size, len(groups), dtype=np.min_scalar_type(len(groups)))
+            self.codes[col][present] = codes
+            self.n_groups[col] = len(groups)
+            self.has_nan[col] = not present.all()
+
+    def present(self, col):
+        return self.codes[col] != self.n_groups[col]
+
+    # Rangos promedio (como pandas) de col entre las filas miembro, en el orden de las filas
+    def ranks(self, col, member):
+        codes = self.codes[col][member]
+        counts = np.bincount(codes, minlength=self.n_groups[col])
+        starts = np.cumsum(counts) - counts
+        return (starts + (counts + 1) / 2)[codes]
+
+    def spearman(self, positions=None):
+        base = np.ones(self.size, dtype=bool)
+        if positions is not None:
+            base = np.zeros(self.size, dtype=bool)
+            base[positions] = True
+        present = {col: self.present(col) for col in self.columns if self.has_nan[col]}
+
+        k = len(self.columns)
+        corr = np.full((k, k), np.nan)
+        cache = {}
+        for i, a in enumerate(self.columns):
+            for j in range(i, k):
+                b = self.columns[j]
+                # Eliminación por pares: solo importan las columnas con nulos
+                dropped = tuple(c for c in dict.fromkeys((a, b)) if self.has_nan[c])
+                member = base.copy()
+                for c in dropped:
+                    member &= present[c]
+                if member.sum() < 2:
+                    continue
+                for c in (a, b):
+                    if (c, dropped) not in cache:
+                        cache[c, dropped] = self.ranks(c, member)
+                x, y = cache[a, dropped], cache[b, dropped]
+                x, y = x - x.mean(), y - y.mean()
+                denominator = np.sqrt((x ** 2).sum() * (y ** 2).sum())
+                if denominator > 0:
+                    corr[i, j] = corr[j, i] = (x * y).sum() / denominator
+        return corr
@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cleaning import default_codes, merge_label_counts
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Rutas por defecto del portafolio
+CSV_PATH = 'Bankloan.csv'
+STORE_PATH = 'Bankloan.parquet'
+
+# Filas por bloque al convertir el CSV (acota el pico de memoria)
+CHUNK_ROWS = 250_000
+
+# Esquema tipado del almacén columnar
+SCHEMA_TYPES = {
+    'age': 'int16',
+    'ed': 'int8',
+    'employ': 'int16',
+    'address': 'int16',
+    'income': 'int64',
+    'debtinc': 'int64',
+    'creddebt': 'int64',
+    'othdebt': 'int64',
+    'default': 'bool',
+}
+
+NUMERIC_COLUMNS = [col for col, dtype in SCHEMA_TYPES.items() if dtype != 'bool']
+
+# Conteos de la conversión que viajan en los metadatos del Parquet hasta el reporte de validación:
+# etiquetas crudas de default, valores no numéricos o no enteros y enteros que no caben en el tipo
+METADATA_COUNTS = ('default_labels', 'malformed_values', 'overflow_values')
+
+# Enteros de Arrow con nulos -> enteros nullable de pandas (sin pasar por float64)
+NULLABLE_TYPES = {} if pa is None else {
+    pa.from_numpy_dtype(np.dtype(dtype)): pd.api.types.pandas_dtype(dtype.capitalize())
+    for dtype in ('int8', 'int16', 'int32', 'int64')
+}
+
+
+def arrow_schema():
+    return pa.schema([(col, pa.from_numpy_dtype(np.dtype(dtype))) for col, dtype in SCHEMA_TYPES.items()])
+
+
+# Valores de una columna cruda en su entero del esquema. Lo que no es un número entero
+# (texto, decimales) o no cabe en el tipo queda nulo y se cuenta, sin redondear ni truncar
+def _narrow(series, dtype):
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    whole = np.isfinite(values) & (values == np.round(values))
+    info = np.iinfo(dtype)
+    fits = whole & (values >= info.min) & (values <= info.max)
+    malformed = int((series.notna().to_numpy() & ~whole).sum())
+    overflow = int((whole & ~fits).sum())
+    return np.where(fits, values, 0).astype(dtype), ~fits, malformed, overflow
+
+
+# Convierte un bloque crudo del CSV a columnas tipadas de Arrow
+def _chunk_to_table(chunk, schema, counts):
+    arrays = []
+    for field in schema:
+        if field.name == 'default':
+            codes, raw_counts = default_codes(chunk['default'])
+            merge_label_counts(counts['default_labels'], raw_counts)
+            arrays.append(pa.array(codes == 1, type=pa.bool_(), mask=codes < 0))
+        else:
+            values, mask, malformed, overflow = _narrow(chunk[field.name], SCHEMA_TYPES[field.name])
+            merge_label_counts(counts['malformed_values'], {field.name: malformed} if malformed else {})
+            merge_label_counts(counts['overflow_values'], {field.name: overflow} if overflow else {})
+            arrays.append(pa.array(values, type=field.type, mask=mask))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _read_csv_chunks(csv_path, columns=None, chunk_rows=CHUNK_ROWS):
+    return pd.read_csv(
+        csv_path,
+        sep=';',
+        encoding='utf-8-sig',
+        usecols=columns,
+        dtype={'default': str},
+        chunksize=chunk_rows,
+    )
+
+
+# Conversión única CSV -> Parquet en streaming por bloques
+def csv_to_parquet(csv_path=CSV_PATH, store_path=STORE_PATH, chunk_rows=CHUNK_ROWS):
+    schema = arrow_schema()
+    tmp_path = f"{store_path}.tmp"
+    rows = 0
+    counts = {name: {} for name in METADATA_COUNTS}
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        for chunk in _read_csv_chunks(csv_path, chunk_rows=chunk_rows):
+            table = _chunk_to_table(chunk, schema, counts)
+            writer.write_table(table)
+            rows += table.num_rows
+        # Los conteos de la conversión se conservan para el reporte de validación
+        writer.add_key_value_metadata({name: json.dumps(value) for name, value in counts.items()})
+    os.replace(tmp_path, store_path)
+    return rows
+
+
+# Recorre un archivo CSV o Parquet en bloques de tamaño fijo sin cargarlo completo
+def iter_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas(types_mapper=NULLABLE_TYPES.get)
+    elif suffix == '.csv':
+        yield from _read_csv_chunks(path, columns=columns, chunk_rows=chunk_rows)
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {suffix}")
+
+
+# Portafolio en bloques tipados sin cargarlo completo: el CSV se convierte una vez al Parquet
+# tipado y se recorre por lotes. Los conteos de la conversión viajan en attrs del primer bloque,
+# así el reporte de validación los cuenta una sola vez al fusionar los de cada bloque
+def iter_portfolio(path=CSV_PATH, chunk_rows=CHUNK_ROWS, store_path=None):
+    if os.path.splitext(path)[1].lower() == '.csv' and pq is not None:
+        store_path = store_path or os.path.splitext(path)[0] + '.parquet'
+        if not store_is_fresh(path, store_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            csv_to_parquet(path, store_path, chunk_rows)
+        path = store_path
+    counts = parquet_counts(path) if path.lower().endswith('.parquet') else {}
+    for i, chunk in enumerate(iter_chunks(path, chunk_rows=chunk_rows)):
+        if i == 0:
+            chunk.attrs.update(counts)
+        yield chunk
+
+
+def store_is_fresh(csv_path=CSV_PATH, store_path=STORE_PATH):
+    if not os.path.exists(store_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(store_path) >= os.path.getmtime(csv_path)
+
+
+def read_parquet(store_path, columns=None):
+    table = pq.read_table(store_path, columns=columns, memory_map=True)
+    df = table.to_pandas(types_mapper=NULLABLE_TYPES.get)
+    df.attrs.update(parquet_counts(store_path))
+    return df
+
+
+def parquet_counts(store_path):
+    metadata = pq.read_metadata(store_path).metadata or {}
+    return {name: json.loads(metadata[name.encode()]) for name in METADATA_COUNTS if name.encode() in metadata}
+
+
+# Lectura de respaldo sin pyarrow: CSV por bloques, solo las columnas pedidas
+def read_csv(csv_path, columns=None):
+    chunks = list(_read_csv_chunks(csv_path, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+# Lectores registrados por extensión de archivo
+LOADERS = {
+    '.parquet': read_parquet,
+    '.csv': read_csv,
+}
+
+
+def register_loader(suffix, loader):
+    LOADERS[suffix.lower()] = loader
+
+
+def load_portfolio(path=CSV_PATH, columns=None, store_path=None):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.csv' and pq is not None:
+        store_path = store_path or os.path.splitext(path)[0] + '.parquet'
+        if not store_is_fresh(path, store_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            csv_to_parquet(path, store_path)
+        return read_parquet(store_path, columns=columns)
+    if suffix not in LOADERS:
+        raise ValueError(f"Formato de archivo no soportado: {suffix}")
+    if suffix == '.csv' and not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return LOADERS[suffix](path, columns=columns)
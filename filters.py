@@ -0,0 +1,211 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from compact import native_values, position_dtype
+
+FILTER_COLUMNS = ('age', 'income')
+
+# Resultados de consultas recientes que se conservan por índice
+QUERY_CACHE_SIZE = 32
+
+# Por encima de esta fracción de filas un barrido secuencial supera al índice
+SCAN_FRACTION = 1 / 16
+
+# Hasta esta fracción de filas excluidas, desmarcarlas en una máscara supera al barrido
+EXCLUDED_FRACTION = 1 / 4
+
+# Tope del slider de edad del sidebar
+AGE_SLIDER_MAX = 65
+
+
+# Rangos iniciales de los sliders (vista sin filtrar), compartidos por el dashboard y el warm-up
+def default_ranges(bounds):
+    age_min, age_max = bounds('age')
+    income_min, income_max = bounds('income')
+    return (int(age_min), min(int(age_max), AGE_SLIDER_MAX)), (int(income_min), int(income_max))
+
+
+# Vista por posiciones sobre el frame base: solo materializa las columnas que se piden.
+# positions es un array de posiciones, una máscara booleana (consultas amplias) o None (todas)
+class FilteredView:
+    def __init__(self, base, positions=None, filters=None):
+        self.base = base
+        self.positions = positions
+        if positions is None:
+            self._size = len(base)
+        elif positions.dtype == bool:
+            self._size = int(np.count_nonzero(positions))
+        else:
+            self._size = len(positions)
+        # (default, rango de edad, rango de ingresos) que produjo la vista
+        self.filters = filters
+        self._columns = {}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def columns(self):
+        return self.base.columns
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._columns:
+                column = self.base[key]
+                if self.positions is not None:
+                    column = column.iloc[self.positions].reset_index(drop=True)
+                self._columns[key] = column
+            return self._columns[key]
+        return pd.DataFrame({col: self[col] for col in key})
+
+
+# Índices ordenados por edad e ingresos, particionados por default. Solo se guardan los
+# valores ordenados y sus posiciones; las columnas se leen del frame que se pasa en cada consulta
+class FilterIndex:
+    def __init__(self, df):
+        self.size = 0
+        self.partitions = {0: {}, 1: {}}
+        # Posiciones con nulos por columna: quedan fuera de todo rango y de los índices
+        self.missing = {col: np.empty(0, dtype=np.int32) for col in FILTER_COLUMNS}
+        self._cache = OrderedDict()
+        self.extend(df)
+
+    # Filas nuevas al final del frame: se intercalan en los índices ordenados sin reordenar lo
+    # existente; a igual valor van detrás, igual que un orden estable sobre todo el frame
+    def extend(self, batch):
+        offset = self.size
+        self.size += len(batch)
+        dtype = position_dtype(self.size)
+        values, present = {}, {}
+        for col in FILTER_COLUMNS:
+            # Valores en el dtype compacto de la columna; los nulos nunca entran en un rango
+            values[col], present[col] = native_values(batch[col])
+            missing = (np.flatnonzero(~present[col]) + offset).astype(dtype)
+            self.missing[col] = np.concatenate([self.missing[col].astype(dtype), missing])
+        default = batch['default'].to_numpy()
+        for value in (0, 1):
+            rows = np.flatnonzero(default == value)
+            for col in FILTER_COLUMNS:
+                local = rows[present[col][rows]]
+                new_values = values[col][local]
+                order = np.argsort(new_values, kind='stable')
+                sorted_values, positions = self.partitions[value].get(col, (new_values[:0], local[:0]))
+                sorted_values = sorted_values.astype(np.result_type(sorted_values, new_values), copy=False)
+                at = np.searchsorted(sorted_values, new_values[order], side='right')
+                self.partitions[value][col] = (
+                    np.insert(sorted_values, at, new_values[order]),
+                    np.insert(positions.astype(dtype, copy=False), at, (local[order] + offset).astype(dtype)),
+                )
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def bounds(self, col):
+        lows, highs = [], []
+        for partition in self.partitions.values():
+            values = partition[col][0]
+            if len(values):
+                lows.append(values[0])
+                highs.append(values[-1])
+        return float(min(lows)), float(max(highs))
+
+    def _bounds(self, partition, col, low, high):
+        values = partition[col][0]
+        # Los límites se llevan al dtype entero del índice: con un escalar de otro tipo numpy
+        # convierte el array completo antes de buscar
+        if values.dtype.kind in 'iu':
+            info = np.iinfo(values.dtype)
+            low, high = np.ceil(low), np.floor(high)
+            if low > high or low > info.max or high < info.min:
+                return 0, 0
+            low, high = values.dtype.type(max(low, info.min)), values.dtype.type(min(high, info.max))
+        return np.searchsorted(values, low, side='left'), np.searchsorted(values, high, side='right')
+
+    def _range(self, partition, col, low, high):
+        start, stop = self._bounds(partition, col, low, high)
+        return partition[col][1][start:stop]
+
+    # Posiciones de la partición fuera de alguno de los dos rangos (pueden repetirse)
+    def _outside(self, partition, age_range, income_range):
+        outside = []
+        for col, (low, high) in (('age', age_range), ('income', income_range)):
+            start, stop = self._bounds(partition, col, low, high)
+            positions = partition[col][1]
+            outside += [positions[:start], positions[stop:]]
+        return outside
+
+    def _query_partition(self, df, partition, age_range, income_range):
+        by_age = self._range(partition, 'age', *age_range)
+        by_income = self._range(partition, 'income', *income_range)
+        # Se parte del rango más selectivo y se comprueba la otra columna sobre él
+        if len(by_age) <= len(by_income):
+            candidates, col, (low, high) = by_age, 'income', income_range
+        else:
+            candidates, col, (low, high) = by_income, 'age', age_range
+        other = df[col].array.take(candidates).to_numpy(dtype='float64', na_value=np.nan)
+        return candidates[(other >= low) & (other <= high)]
+
+    def _candidate_count(self, partition, age_range, income_range):
+        return min(len(self._range(partition, col, *bounds))
+                   for col, bounds in (('age', age_range), ('income', income_range)))
+
+    def _scan(self, df, default_value, age_range, income_range):
+        (age, age_present), (income, income_present) = (native_values(df[col]) for col in FILTER_COLUMNS)
+        mask = age_present & income_present
+        mask &= (age >= age_range[0]) & (age <= age_range[1])
+        mask &= (income >= income_range[0]) & (income <= income_range[1])
+        if default_value is not None:
+            mask &= df['default'].to_numpy() == default_value
+        return mask
+
+    # Rango casi completo (p. ej. la vista inicial): todas las filas de la clase menos las pocas
+    # que el índice deja fuera de los rangos y las que tienen nulos, sin recorrer las columnas
+    def _all_but(self, df, default_value, excluded):
+        if default_value is None:
+            mask = np.ones(self.size, dtype=bool)
+        else:
+            mask = df['default'].to_numpy() == default_value
+        for positions in excluded:
+            mask[positions] = False
+        return mask
+
+    # Filas que cumplen los filtros: posiciones ordenadas si son pocas, máscara booleana si
+    # son muchas (no se materializa un array casi tan largo como la tabla), o None si son todas
+    def query(self, df, default_value, age_range, income_range):
+        key = (default_value, tuple(age_range), tuple(income_range))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        values = (0, 1) if default_value is None else (default_value,)
+        partitions = [self.partitions[v] for v in values]
+        candidates = sum(self._candidate_count(p, age_range, income_range) for p in partitions)
+        if candidates <= self.size * SCAN_FRACTION:
+            parts = [self._query_partition(df, p, age_range, income_range) for p in partitions]
+            positions = np.sort(np.concatenate(parts))
+        else:
+            excluded = [self.missing[col] for col in FILTER_COLUMNS]
+            for partition in partitions:
+                excluded += self._outside(partition, age_range, income_range)
+            if sum(len(e) for e in excluded) <= self.size * EXCLUDED_FRACTION:
+                positions = self._all_but(df, default_value, excluded)
+            else:
+                positions = self._scan(df, default_value, age_range, income_range)
+            if np.count_nonzero(positions) == self.size:
+                positions = None
+
+        self._cache[key] = positions
+        if len(self._cache) > QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return positions
+
+    def view(self, df, default_value, age_range, income_range):
+        positions = self.query(df, default_value, age_range, income_range)
+        return FilteredView(df, positions, (default_value, tuple(age_range), tuple(income_range)))
@@ -0,0 +1,482 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from cleaning import RANGOS_VALIDOS, clean_portfolio, merge_reports
+from compact import compact_frame
+from correlation import CorrelationEngine, RankCache
+from data_store import CHUNK_ROWS, CSV_PATH, LOADERS, SCHEMA_TYPES, iter_portfolio
+from filters import FilterIndex
+from kpi_cube import KPICube
+from profiling import file_hash
+from sampling import build_sampler
+from scoring import FEATURES
+from segments import SegmentEngine
+from sketches import PortfolioSketch
+
+# Almacén del portafolio: particiones limpias e inmutables y un manifiesto de versiones
+PORTFOLIO_DIR = 'portfolio'
+MANIFEST_FILE = 'versions.json'
+
+# Estados (frame + motores) que se conservan en memoria por proceso
+STATE_CACHE_SIZE = 2
+
+# Motores que se modifican al avanzar de versión: se copian antes para no alterar el estado
+# que otras sesiones siguen leyendo. Segmentos y rangos de Spearman dependen de cuantiles y
+# órdenes globales y se reconstruyen bajo demanda en la versión nueva
+MUTABLE_ENGINES = ('filter_index', 'kpi_cube', 'sampler', 'correlation_engine')
+
+
+def content_hash(df):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Identificador de versión: número correlativo y huella de la lista de particiones, de modo
+# que una versión nunca se confunde con otra de un almacén reiniciado
+def version_id(number, partition_hashes):
+    digest = hashlib.blake2b('|'.join(partition_hashes).encode(), digest_size=16).hexdigest()
+    return f"v{number}-{digest[:8]}"
+
+
+# Agregados mínimos de una partición para comparar versiones sin cargar sus filas (son sumas:
+# los de cada bloque se acumulan)
+def partition_summary(df):
+    summary = {'rows': len(df), 'defaults': int(df['default'].sum())}
+    for col in ('income', 'age'):
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        summary[f"{col}_sum"] = float(np.nansum(values))
+        summary[f"{col}_count"] = int((~np.isnan(values)).sum())
+    return summary
+
+
+# Tipo fijo de cada columna en el Parquet de una partición: el entero nullable del esquema
+# tipado, porque cada bloque limpio se compacta a su propio rango (al leer se vuelve a compactar).
+# Una columna que no cabe en ese entero (un lote crudo con decimales) se guarda tal cual
+def partition_types(clean):
+    types = {}
+    for col in RANGOS_VALIDOS:
+        if col not in clean.columns or col not in SCHEMA_TYPES:
+            continue
+        series = clean[col]
+        if not pd.api.types.is_integer_dtype(series.dtype):
+            continue
+        info = np.iinfo(SCHEMA_TYPES[col])
+        if series.isna().all() or (info.min <= series.min() and series.max() <= info.max):
+            types[col] = SCHEMA_TYPES[col].capitalize()
+    return types
+
+
+def read_batch(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in LOADERS:
+        raise ValueError(f"Formato de archivo no soportado: {suffix}")
+    return LOADERS[suffix](path)
+
+
+# Frame y motores de una versión. Los motores se construyen bajo demanda y, al avanzar a una
+# versión posterior, los ya construidos se actualizan solo con las filas nuevas
+class PortfolioState:
+    def __init__(self, version, df, report, sketches=None):
+        self.version = version
+        self.df = df
+        self.report = report
+        self._engines = {} if sketches is None else {'sketches': sketches}
+        self._lock = threading.RLock()
+
+    @property
+    def version_id(self):
+        return self.version['id']
+
+    def _engine(self, name, build):
+        with self._lock:
+            if name not in self._engines:
+                self._engines[name] = build()
+            return self._engines[name]
+
+    @property
+    def filter_index(self):
+        return self._engine('filter_index', lambda: FilterIndex(self.df))
+
+    @property
+    def kpi_cube(self):
+        return self._engine('kpi_cube', lambda: KPICube(self.df))
+
+    @property
+    def correlation_engine(self):
+        return self._engine('correlation_engine', lambda: CorrelationEngine(self.df, grid=self.kpi_cube.grid))
+
+    @property
+    def rank_cache(self):
+        return self._engine('rank_cache', lambda: RankCache(self.df))
+
+    @property
+    def segment_engine(self):
+        return self._engine('segment_engine', lambda: SegmentEngine(self.df))
+
+    # Muestra estratificada del gráfico 3D sobre la rejilla del cubo (una pasada por bloques)
+    @property
+    def sampler(self):
+        def build():
+            chunks = (self.df.iloc[start:start + CHUNK_ROWS] for start in range(0, len(self.df), CHUNK_ROWS))
+            return build_sampler(chunks, self.kpi_cube.grid)
+        return self._engine('sampler', build)
+
+    @property
+    def sketches(self):
+        return self._engines.get('sketches')
+
+    # Probabilidad de default de todas las filas con el modelo indicado
+    def scores(self, risk_model):
+        with self._lock:
+            model, scores = self._engines.get('scores', (None, None))
+            if model is not risk_model:
+                scores = risk_model.predict_proba(self.df[FEATURES])
+                self._engines['scores'] = (risk_model, scores)
+            return scores
+
+    # Estado de una versión posterior: las filas nuevas van al final del frame, así que los
+    # índices, el cubo, la muestra y los estadísticos de correlación solo procesan el lote
+    def advance(self, version, batch, report, sketches=()):
+        offset = len(self.df)
+        state = PortfolioState(version, pd.concat([self.df, batch], ignore_index=True), report)
+        with self._lock:
+            # Una sola copia conjunta: la muestra, el cubo y la correlación siguen compartiendo la rejilla
+            engines = copy.deepcopy({name: self._engines[name] for name in MUTABLE_ENGINES if name in self._engines})
+            previous_sketches = self._engines.get('sketches')
+            previous_scores = self._engines.get('scores')
+
+        if 'filter_index' in engines:
+            engines['filter_index'].extend(batch)
+        if 'kpi_cube' in engines:
+            engines['kpi_cube'].extend(batch)
+        if 'sampler' in engines:
+            engines['sampler'].add_chunk(batch, offset)
+        if 'correlation_engine' in engines:
+            engines['correlation_engine'].add_batch(batch)
+        if previous_sketches is not None:
+            engines['sketches'] = reduce(PortfolioSketch.merge, sketches, previous_sketches)
+        if previous_scores is not None:
+            model, scores = previous_scores
+            engines['scores'] = (model, np.concatenate([scores, model.predict_proba(batch[FEATURES])]))
+        state._engines = engines
+        return state
+
+
+# Ingesta incremental en modo append: cada lote se limpia una sola vez y se guarda como una
+# partición inmutable; cada versión es la lista ordenada de particiones que la componen
+class PortfolioStore:
+    def __init__(self, root=PORTFOLIO_DIR, state_cache_size=STATE_CACHE_SIZE):
+        self.root = root
+        self.state_cache_size = state_cache_size
+        os.makedirs(root, exist_ok=True)
+        self._manifest = None
+        self._manifest_mtime = None
+        self._states = OrderedDict()
+        self._sketch_states = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    # El manifiesto se relee solo cuando otro proceso lo reemplaza (p. ej. la CLI de ingesta)
+    def manifest(self):
+        try:
+            mtime = os.stat(self._path(MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return {'base': None, 'partitions': {}, 'versions': []}
+        if mtime != self._manifest_mtime:
+            with open(self._path(MANIFEST_FILE), encoding='utf-8') as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _save_manifest(self, manifest):
+        path = self._path(MANIFEST_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def versions(self):
+        return self.manifest()['versions']
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1]['id'] if versions else None
+
+    def version(self, version_id=None):
+        versions = self.versions()
+        if not versions:
+            raise LookupError("El almacén no tiene versiones")
+        if version_id is None:
+            return versions[-1]
+        for version in versions:
+            if version['id'] == version_id:
+                return version
+        raise LookupError(f"Versión desconocida: {version_id}")
+
+    def partition(self, partition_id):
+        return self.manifest()['partitions'][partition_id]
+
+    # Particiones añadidas entre dos versiones (las versiones solo crecen por el final)
+    def changes(self, since_id, version_id=None):
+        version = self.version(version_id)
+        if since_id is None:
+            return [self.partition(pid) for pid in version['partitions']]
+        since = self.version(since_id)['partitions']
+        if version['partitions'][:len(since)] != since:
+            raise ValueError(f"{version['id']} no deriva de {since_id}")
+        return [self.partition(pid) for pid in version['partitions'][len(since):]]
+
+    # El CSV base es la primera partición; si su contenido cambia (no es un append) se reinicia el almacén
+    def sync_base(self, csv_path=CSV_PATH, source_hash=None):
+        source_hash = source_hash or file_hash(csv_path)
+        with self._lock:
+            if self.manifest()['base'] == source_hash:
+                return self.latest()
+            self.reset()
+            manifest = copy.deepcopy(self.manifest())
+            manifest['base'] = source_hash
+            # Una pasada por bloques: la partición base y su sketch se escriben sin cargar el CSV completo
+            chunks = iter_portfolio(csv_path, chunk_rows=CHUNK_ROWS)
+            return self._append(manifest, chunks, source_hash, os.path.basename(csv_path))['id']
+
+    def reset(self):
+        with self._lock:
+            manifest = self.manifest()
+            for entry in manifest['partitions'].values():
+                for name in (entry['file'], entry['sketch']):
+                    try:
+                        os.remove(self._path(name))
+                    except FileNotFoundError:
+                        pass
+            self._save_manifest({'base': None, 'partitions': {}, 'versions': []})
+            self._states.clear()
+            self._sketch_states.clear()
+
+    # Lote crudo nuevo: solo estas filas se limpian; devuelve la versión creada o None si el
+    # mismo contenido ya estaba ingerido
+    def append(self, raw, source='lote', source_hash=None):
+        source_hash = source_hash or content_hash(raw)
+        with self._lock:
+            manifest = copy.deepcopy(self.manifest())
+            if manifest['base'] is None:
+                raise ValueError("El almacén no tiene versión base: ejecuta sync_base primero")
+            if any(entry['hash'] == source_hash for entry in manifest['partitions'].values()):
+                return None
+            return self._append(manifest, [raw], source_hash, source)
+
+    def append_file(self, path):
+        return self.append(read_batch(path), os.path.basename(path), file_hash(path))
+
+    # Escribe una partición desde bloques crudos: cada bloque se limpia, se añade al Parquet y al
+    # sketch de la partición y se descarta, así la memoria no crece con el tamaño del lote
+    def _append(self, manifest, chunks, source_hash, source):
+        # Las particiones son Parquet: sin pyarrow el almacén no puede escribirlas
+        if pq is None:
+            raise ImportError("El almacén del portafolio necesita pyarrow para escribir particiones (pip install pyarrow)")
+        versions = manifest['versions']
+        base = manifest['partitions'][versions[-1]['partitions'][0]] if versions else None
+        partition_id = f"{len(manifest['partitions']):05d}-{source_hash[:8]}"
+        entry = {
+            'id': partition_id,
+            'file': f"part-{partition_id}.parquet",
+            'sketch': f"part-{partition_id}.sketch.npz",
+            'source': source,
+            'hash': source_hash,
+        }
+        tmp_path = self._path(f"{entry['file']}.tmp")
+        sketch = PortfolioSketch()
+        reports, summary, writer = [], {}, None
+        try:
+            for raw in chunks:
+                if base is not None:
+                    missing = [col for col in base['columns'] if col not in raw.columns and col != 'default_label']
+                    if missing:
+                        raise ValueError(f"Faltan columnas en el lote: {', '.join(missing)}")
+                clean, report = clean_portfolio(raw)
+                table = pa.Table.from_pandas(clean.astype(partition_types(clean)), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression='zstd')
+                    entry['columns'] = list(clean.columns)
+                writer.write_table(table)
+                sketch.add_chunk(clean)
+                reports.append(report)
+                for field, value in partition_summary(clean).items():
+                    summary[field] = summary.get(field, 0) + value
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError(f"El lote {source} no tiene filas")
+        os.replace(tmp_path, self._path(entry['file']))
+        sketch.save(self._path(entry['sketch']))
+        entry.update({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'report': merge_reports(reports),
+            'summary': summary,
+        })
+
+        partitions = (versions[-1]['partitions'] if versions else []) + [partition_id]
+        manifest['partitions'][partition_id] = entry
+        hashes = [manifest['partitions'][pid]['hash'] for pid in partitions]
+        version = {
+            'id': version_id(len(versions) + 1, hashes),
+            'number': len(versions) + 1,
+            'partitions': partitions,
+            'rows': sum(manifest['partitions'][pid]['summary']['rows'] for pid in partitions),
+            'created': entry['created'],
+        }
+        versions.append(version)
+        self._save_manifest(manifest)
+        return version
+
+    def _read_partition(self, partition_id):
+        return pd.read_parquet(self._path(self.partition(partition_id)['file']))
+
+    # Las particiones guardan enteros del esquema tipado; en memoria cada columna vuelve al
+    # entero más pequeño que contiene el rango de la versión
+    def _read_partitions(self, partition_ids):
+        frames = [self._read_partition(pid) for pid in partition_ids]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        df = compact_frame(df, [col for col in RANGOS_VALIDOS if col in df.columns])
+        return df, merge_reports(self.partition(pid)['report'] for pid in partition_ids)
+
+    def _read_sketches(self, partition_ids):
+        return [PortfolioSketch.load(self._path(self.partition(pid)['sketch'])) for pid in partition_ids]
+
+    # Estado de una versión (la última si no se indica). Si en memoria hay una versión anterior
+    # de la misma serie, se avanza con las particiones nuevas en lugar de releer y reconstruir todo
+    def state(self, version_id=None):
+        with self._lock:
+            version = self.version(version_id)
+            if version['id'] in self._states:
+                self._states.move_to_end(version['id'])
+                return self._states[version['id']]
+
+            previous = None
+            for state in self._states.values():
+                known = state.version['partitions']
+                if len(known) < len(version['partitions']) and version['partitions'][:len(known)] == known:
+                    if previous is None or len(known) > len(previous.version['partitions']):
+                        previous = state
+            if previous is not None:
+                new_ids = version['partitions'][len(previous.version['partitions']):]
+                batch, _ = self._read_partitions(new_ids)
+                report = merge_reports(self.partition(pid)['report'] for pid in version['partitions'])
+                state = previous.advance(version, batch, report, self._read_sketches(new_ids))
+            else:
+                df, report = self._read_partitions(version['partitions'])
+                sketches = reduce(PortfolioSketch.merge, self._read_sketches(version['partitions']))
+                state = PortfolioState(version, df, report, sketches)
+
+            self._states[version['id']] = state
+            while len(self._states) > self.state_cache_size:
+                self._states.popitem(last=False)
+            return state
+
+    # Estado aproximado de una versión: sketches fusionados y reporte, sin leer ninguna partición
+    # ni construir índices (df es None). Es lo único que necesita el modo aproximado del dashboard
+    def sketch_state(self, version_id=None):
+        with self._lock:
+            version = self.version(version_id)
+            if version['id'] in self._states:
+                state = self._states[version['id']]
+                return PortfolioState(version, None, state.report, state.sketches)
+            if version['id'] in self._sketch_states:
+                self._sketch_states.move_to_end(version['id'])
+                return self._sketch_states[version['id']]
+
+            report = merge_reports(self.partition(pid)['report'] for pid in version['partitions'])
+            sketches = reduce(PortfolioSketch.merge, self._read_sketches(version['partitions']))
+            state = PortfolioState(version, None, report, sketches)
+            self._sketch_states[version['id']] = state
+            while len(self._sketch_states) > self.state_cache_size:
+                self._sketch_states.popitem(last=False)
+            return state
+
+    def summary(self, version_id=None):
+        version = self.version(version_id)
+        totals = {}
+        for pid in version['partitions']:
+            for field, value in self.partition(pid)['summary'].items():
+                totals[field] = totals.get(field, 0) + value
+        return {
+            'Filas': totals['rows'],
+            'Particiones': len(version['partitions']),
+            'Tasa de Default': totals['defaults'] / totals['rows'] if totals['rows'] else np.nan,
+            'Ingreso Promedio': totals['income_sum'] / totals['income_count'] if totals['income_count'] else np.nan,
+            'Edad Promedio': totals['age_sum'] / totals['age_count'] if totals['age_count'] else np.nan,
+        }
+
+    # Comparación de dos versiones a partir de los agregados de sus particiones
+    def compare(self, version_a, version_b):
+        a, b = self.summary(version_a), self.summary(version_b)
+        return pd.DataFrame({version_a: a, version_b: b, 'Diferencia': {k: b[k] - a[k] for k in a}})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta incremental de lotes nuevos al portafolio versionado")
+    parser.add_argument('batches', nargs='*', help="Archivos CSV o Parquet con préstamos nuevos")
+    parser.add_argument('--base', default=CSV_PATH, help="CSV base (primera partición)")
+    parser.add_argument('--store', default=PORTFOLIO_DIR)
+    parser.add_argument('--list', action='store_true', help="Muestra las versiones del almacén")
+    args = parser.parse_args(argv)
+
+    store = PortfolioStore(args.store)
+    try:
+        store.sync_base(args.base)
+    except FileNotFoundError:
+        print(f"❌ No se encontró el archivo base {args.base}")
+        return 1
+    except ImportError as e:
+        print(f"❌ {e}")
+        return 1
+
+    status = 0
+    for path in args.batches:
+        start = time.perf_counter()
+        try:
+            version = store.append_file(path)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            status = 1
+            continue
+        if version is None:
+            print(f"⚠️ {path}: el lote ya estaba ingerido")
+            continue
+        added = store.partition(version['partitions'][-1])['summary']['rows']
+        print(
+            f"✅ {path}: versión {version['id']} (+{added:,} filas, {version['rows']:,} en total) "
+            f"en {time.perf_counter() - start:.1f}s"
+        )
+
+    if args.list or not args.batches:
+        for version in store.versions():
+            print(f"{version['id']}  {version['created']}  {version['rows']:>12,} filas  {len(version['partitions'])} particiones")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
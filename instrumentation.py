@@ -0,0 +1,134 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Ejecuciones (reruns completos o de fragmentos) que se conservan por sesión
+RUN_HISTORY = 20
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_local = threading.local()
+
+
+# Memoria residente actual; sin /proc se usa el pico que reporta el sistema
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Tracer:
+    def __init__(self, history=RUN_HISTORY):
+        self.runs = deque(maxlen=history)
+        self.origin = time.perf_counter()
+        self._stack = []
+
+    def start_run(self, name):
+        self.runs.append({'name': name, 'started': time.time(), 'spans': []})
+
+    @contextmanager
+    def span(self, name, category='stage', rows=None, payload_bytes=None):
+        if not self.runs:
+            self.start_run(name)
+        record = {
+            'name': name, 'category': category, 'depth': len(self._stack),
+            'rows': rows, 'payload_bytes': payload_bytes, 'thread': threading.get_ident(),
+        }
+        self._stack.append(record)
+        rss = current_rss()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            record['start_ms'] = (start - self.origin) * 1000
+            record['wall_ms'] = (end - start) * 1000
+            record['memory_delta_bytes'] = current_rss() - rss
+            self.runs[-1]['spans'].append(record)
+
+    def spans(self):
+        return [dict(span, run=i) for i, run in enumerate(self.runs) for span in run['spans']]
+
+    def summary(self):
+        totals = {}
+        for span in self.spans():
+            total = totals.setdefault(span['name'], {
+                'calls': 0, 'wall_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'payload_bytes': 0, 'memory_delta_bytes': 0
+            })
+            total['calls'] += 1
+            total['wall_ms'] += span['wall_ms']
+            total['max_ms'] = max(total['max_ms'], span['wall_ms'])
+            total['rows'] += span['rows'] or 0
+            total['payload_bytes'] += span['payload_bytes'] or 0
+            total['memory_delta_bytes'] += span['memory_delta_bytes']
+        return totals
+
+    def to_json(self):
+        return json.dumps({'runs': list(self.runs), 'summary': self.summary()}, indent=2, default=str)
+
+    # Formato de chrome://tracing y Perfetto: eventos completos ("X") en microsegundos
+    def to_chrome_trace(self):
+        events = []
+        for span in self.spans():
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': round(span['start_ms'] * 1000, 3),
+                'dur': round(span['wall_ms'] * 1000, 3),
+                'pid': os.getpid(),
+                'tid': span['thread'],
+                'args': {
+                    'run': span['run'],
+                    'rows': span['rows'],
+                    'payload_bytes': span['payload_bytes'],
+                    'memory_delta_bytes': span['memory_delta_bytes'],
+                },
+            })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+# Tracer activo en el hilo actual; sin tracer las mediciones no cuestan nada
+def activate(tracer):
+    _local.tracer = tracer
+
+
+def active_tracer():
+    return getattr(_local, 'tracer', None)
+
+
+@contextmanager
+def span(name, category='stage', rows=None, payload_bytes=None):
+    tracer = active_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, category, rows, payload_bytes) as record:
+        yield record
+
+
+def _rows_of(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+# Envuelve una función completa; las filas se toman del primer argumento (frame o vista)
+def traced(name=None, category='section'):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__, category, rows=_rows_of(args[0]) if args else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
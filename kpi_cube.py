@@ -0,0 +1,158 @@
+import numpy as np
+
+from compact import position_dtype
+
+MEASURES = ('income', 'age', 'default')
+
+# Número de bins por cuantiles para los ingresos
+INCOME_BINS = 64
+
+
+# Rejilla de buckets (default x edad de 1 año x bin de ingresos por cuantiles) sobre las filas
+# con edad e ingresos válidos; los filtros del sidebar excluyen los nulos igual que la rejilla
+class BucketGrid:
+    def __init__(self, df, income_bins=INCOME_BINS):
+        age, income, default, positions = self._valid_rows(df)
+
+        self.age_start = np.floor(age.min()) if len(age) else 0.0
+        n_age = int(np.floor(age.max()) - self.age_start) + 1 if len(age) else 1
+        quantiles = np.quantile(income, np.linspace(0, 1, income_bins + 1)) if len(income) else [0.0, 1.0]
+        self.income_edges = np.unique(quantiles)
+        n_income = max(len(self.income_edges) - 1, 1)
+        self.shape = (2, n_age, n_income)
+        self.n_cells = 2 * n_age * n_income
+        # Filas ya asignadas; la rejilla puede estar compartida por varios motores
+        self.size = 0
+
+        # Mínimos y máximos reales por bin: deciden si un bin queda dentro, fuera o cortado
+        self.age_bounds = (np.full(n_age, np.inf), np.full(n_age, -np.inf))
+        self.income_bounds = (np.full(n_income, np.inf), np.full(n_income, -np.inf))
+        # Ids de celda en el entero sin signo más chico que los contiene (miles de celdas: 16 bits)
+        self.cells = np.empty(0, dtype=np.min_scalar_type(self.n_cells))
+        self.positions = np.empty(0, dtype=position_dtype(len(df)))
+        self.extend(df)
+
+    @staticmethod
+    def _valid_rows(df, offset=0):
+        age = df['age'].to_numpy(dtype='float64', na_value=np.nan)
+        income = df['income'].to_numpy(dtype='float64', na_value=np.nan)
+        default = df['default'].to_numpy().astype(np.int64)
+        valid = ~np.isnan(age) & ~np.isnan(income)
+        return age[valid], income[valid], default[valid], np.flatnonzero(valid) + offset
+
+    # Celda de cada fila válida, sin modificar la rejilla
+    def assign(self, df, offset=0):
+        age, income, default, positions = self._valid_rows(df, offset)
+        _, n_age, n_income = self.shape
+        age_bin = np.clip(np.floor(age) - self.age_start, 0, n_age - 1).astype(np.int64)
+        income_bin = np.clip(np.searchsorted(self.income_edges, income, side='right') - 1, 0, n_income - 1)
+        cells = (default * n_age + age_bin) * n_income + income_bin
+        return cells, positions, age_bin, income_bin, age, income, default
+
+    # Asigna celdas a filas nuevas; offset es la posición de la primera fila del lote. Si otro
+    # motor que comparte la rejilla ya la extendió con este lote, solo se devuelven sus celdas
+    def extend(self, df, offset=0):
+        if offset + len(df) <= self.size:
+            return self.assign(df, offset)[:2]
+        cells, positions, age_bin, income_bin, age, income, default = self.assign(df, offset)
+        self.size = offset + len(df)
+        for bounds, bins, values in ((self.age_bounds, age_bin, age), (self.income_bounds, income_bin, income)):
+            np.minimum.at(bounds[0], bins, values)
+            np.maximum.at(bounds[1], bins, values)
+
+        self.cells = np.concatenate([self.cells, cells]).astype(self.cells.dtype)
+        self.positions = np.concatenate([self.positions, positions]).astype(position_dtype(offset + len(df)))
+        # Filas ordenadas por celda para la pasada de corrección
+        order = np.argsort(self.cells, kind='stable')
+        self.cells, self.positions = self.cells[order], self.positions[order]
+        self.counts = np.bincount(self.cells, minlength=self.n_cells)
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+        return cells, positions
+
+    @staticmethod
+    def _classify(bounds, value_range):
+        low, high = bounds
+        inside = (low >= value_range[0]) & (high <= value_range[1])
+        touched = (high >= value_range[0]) & (low <= value_range[1])
+        return inside, touched & ~inside
+
+    # Celdas completamente dentro del filtro (máscara) y celdas cortadas por el borde (ids)
+    def select(self, default_value, age_range, income_range):
+        classes = [0, 1] if default_value is None else [default_value]
+        age_in, age_cut = self._classify(self.age_bounds, age_range)
+        income_in, income_cut = self._classify(self.income_bounds, income_range)
+
+        full = np.zeros(self.shape, dtype=bool)
+        full[classes] = np.outer(age_in, income_in)
+        partial = np.zeros(self.shape, dtype=bool)
+        partial[classes] = np.outer(age_in | age_cut, income_in | income_cut)
+        partial &= ~full
+        cells = np.flatnonzero(partial.ravel() & (self.counts > 0))
+        return full.ravel(), cells
+
+    # Índices (en el orden por celda) de las filas de las celdas indicadas
+    def rows_in(self, cells):
+        starts, stops = self.offsets[cells], self.offsets[cells + 1]
+        lengths = stops - starts
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+# Cubo preagregado sobre la rejilla con count, suma y suma de cuadrados.
+# Las celdas que el filtro corta se corrigen con las filas crudas de esa celda, leídas del
+# frame que se pasa en cada consulta (el cubo no guarda copias de las columnas)
+class KPICube:
+    def __init__(self, df, income_bins=INCOME_BINS):
+        self.grid = grid = BucketGrid(df, income_bins)
+        self.size = len(df)
+        self.count = grid.counts
+        self.sums, self.sumsq = {}, {}
+        for m in MEASURES:
+            values = df[m].iloc[grid.positions].to_numpy(dtype='float64', na_value=np.nan)
+            self.sums[m] = np.bincount(grid.cells, weights=values, minlength=grid.n_cells)
+            self.sumsq[m] = np.bincount(grid.cells, weights=values ** 2, minlength=grid.n_cells)
+
+    # Filas nuevas al final del frame: solo se suman sus celdas al cubo
+    def extend(self, batch):
+        offset = self.size
+        self.size += len(batch)
+        cells, positions = self.grid.extend(batch, offset)
+        self.count = self.grid.counts
+        for m in MEASURES:
+            values = batch[m].iloc[positions - offset].to_numpy(dtype='float64', na_value=np.nan)
+            self.sums[m] += np.bincount(cells, weights=values, minlength=self.grid.n_cells)
+            self.sumsq[m] += np.bincount(cells, weights=values ** 2, minlength=self.grid.n_cells)
+
+    def query(self, df, default_value, age_range, income_range):
+        full, cells = self.grid.select(default_value, age_range, income_range)
+
+        # Celdas completamente dentro del filtro: suma directa sobre el cubo
+        count = float(self.count[full].sum())
+        sums = {m: self.sums[m][full].sum() for m in MEASURES}
+        sumsq = {m: self.sumsq[m][full].sum() for m in MEASURES}
+
+        # Celdas cortadas por el borde del rango: corrección exacta sobre sus filas
+        if len(cells):
+            rows = self.grid.positions[self.grid.rows_in(cells)]
+            values = {m: df[m].iloc[rows].to_numpy(dtype='float64', na_value=np.nan) for m in MEASURES}
+            age, income = values['age'], values['income']
+            keep = (age >= age_range[0]) & (age <= age_range[1]) & (income >= income_range[0]) & (income <= income_range[1])
+            count += keep.sum()
+            for m in MEASURES:
+                sums[m] += values[m][keep].sum()
+                sumsq[m] += (values[m][keep] ** 2).sum()
+
+        return summarize(count, sums, sumsq)
+
+
+def summarize(count, sums, sumsq):
+    result = {'count': int(count), 'mean': {}, 'std': {}}
+    for m in MEASURES:
+        if count == 0:
+            result['mean'][m] = np.nan
+            result['std'][m] = np.nan
+            continue
+        mean = sums[m] / count
+        variance = max(sumsq[m] / count - mean ** 2, 0.0) * count / (count - 1) if count > 1 else np.nan
+        result['mean'][m] = mean
+        result['std'][m] = np.sqrt(variance)
+    return result
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from cleaning import clean_portfolio
+from data_store import CSV_PATH, load_portfolio
+from scoring import FEATURES, MODEL_DIR, MODEL_PARAMS
+
+N_FOLDS = 5
+CV_SEED = 42
+CACHE_DIR = os.path.join(MODEL_DIR, 'cv_cache')
+
+PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [5, 10, None],
+    'class_weight': [None, 'balanced'],
+}
+
+# Successive halving: cada ronda conserva 1/ETA candidatos y multiplica por ETA las filas
+HALVING_ETA = 3
+HALVING_MIN_FRACTION = 1 / 9
+
+
+def param_candidates(grid=PARAM_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def data_hash(X, y):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+# Arrays compartidos entre procesos: los workers los ven en solo lectura, sin pickle por tarea
+class SharedArrays:
+    def __init__(self, **arrays):
+        self.blocks = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks[name] = block
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared = {}
+_blocks = []
+
+
+def _attach(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _shared[name] = array
+
+
+# Una tarea = un candidato en un fold, entrenado con la fracción de filas indicada
+def evaluate_fold(params, fold, fraction):
+    X, y, folds, order = _shared['X'], _shared['y'], _shared['folds'], _shared['order']
+    # Subconjunto determinista: prefijo de una permutación fija
+    subset = order[:max(int(len(order) * fraction), 1)]
+    train = subset[folds[subset] != fold]
+    test = np.flatnonzero(folds == fold)
+    # Imputación por medias de las filas de entrenamiento del fold: el fold de validación no
+    # aporta nada a los valores con que se rellenan sus faltantes
+    X_train, X_test = X[train], X[test]
+    means = np.nanmean(X_train, axis=0)
+    X_train = np.where(np.isnan(X_train), means, X_train)
+    X_test = np.where(np.isnan(X_test), means, X_test)
+    model = RandomForestClassifier(**{**MODEL_PARAMS, **params}, n_jobs=1)
+    model.fit(X_train, y[train])
+    proba = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    return {
+        'fold': fold,
+        'accuracy': float(accuracy_score(y[test], proba >= 0.5)),
+        'roc_auc': float(roc_auc_score(y[test], proba)) if len(np.unique(y[test])) > 1 else None,
+    }
+
+
+class EvaluationCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        digest = hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def put(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(f"{path}.tmp", path)
+
+
+# X con faltantes como NaN: cada fold imputa con las medias de sus filas de entrenamiento
+class CrossValidator:
+    def __init__(self, X, y, n_folds=N_FOLDS, seed=CV_SEED, workers=None, cache_dir=CACHE_DIR):
+        self.X = np.asarray(X, dtype='float64')
+        self.y = np.asarray(y, dtype=np.int64)
+        self.n_folds = n_folds
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = EvaluationCache(cache_dir)
+        self.data_hash = data_hash(self.X, self.y)
+
+        folds = np.empty(len(self.y), dtype=np.int64)
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+        for fold, (_, test) in enumerate(splitter.split(self.X, self.y)):
+            folds[test] = fold
+        self.folds = folds
+        self.order = np.random.default_rng(seed).permutation(len(self.y))
+
+    def _key(self, params, fold, fraction):
+        return {
+            'data': self.data_hash, 'params': params, 'fold': fold, 'fraction': fraction,
+            'n_folds': self.n_folds, 'seed': self.seed, 'base': MODEL_PARAMS,
+        }
+
+    # Evalúa candidatos en todos los folds; lo ya calculado sale de la caché en disco
+    def evaluate(self, candidates, fraction=1.0):
+        results = {}
+        todo = []
+        for i, params in enumerate(candidates):
+            for fold in range(self.n_folds):
+                cached = self.cache.get(self._key(params, fold, fraction))
+                if cached is None:
+                    todo.append((i, params, fold))
+                else:
+                    results[i, fold] = cached
+
+        if todo:
+            arrays = dict(X=self.X, y=self.y, folds=self.folds, order=self.order)
+            with SharedArrays(**arrays) as shared, ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_attach, initargs=(shared.specs,)
+            ) as pool:
+                futures = {(i, fold): (params, pool.submit(evaluate_fold, params, fold, fraction)) for i, params, fold in todo}
+                for (i, fold), (params, future) in futures.items():
+                    results[i, fold] = future.result()
+                    self.cache.put(self._key(params, fold, fraction), results[i, fold])
+
+        rows = []
+        for i, params in enumerate(candidates):
+            scores = [results[i, fold] for fold in range(self.n_folds)]
+            auc = [s['roc_auc'] for s in scores if s['roc_auc'] is not None]
+            rows.append({
+                **{k: params.get(k) for k in PARAM_GRID},
+                'fraction': fraction,
+                'mean_roc_auc': float(np.mean(auc)) if auc else np.nan,
+                'std_roc_auc': float(np.std(auc)) if auc else np.nan,
+                'mean_accuracy': float(np.mean([s['accuracy'] for s in scores])),
+            })
+        return pd.DataFrame(rows)
+
+    def grid_search(self, grid=PARAM_GRID):
+        return self.evaluate(param_candidates(grid)).sort_values('mean_roc_auc', ascending=False, ignore_index=True)
+
+    def successive_halving(self, grid=PARAM_GRID, eta=HALVING_ETA, min_fraction=HALVING_MIN_FRACTION):
+        candidates = param_candidates(grid)
+        fraction = min_fraction
+        rounds = []
+        while True:
+            scores = self.evaluate(candidates, fraction)
+            scores['round'] = len(rounds)
+            rounds.append(scores)
+            if len(candidates) <= 1 or fraction >= 1.0:
+                break
+            keep = max(len(candidates) // eta, 1)
+            best = scores.sort_values('mean_roc_auc', ascending=False).index[:keep]
+            candidates = [candidates[i] for i in best]
+            fraction = min(fraction * eta, 1.0)
+        history = pd.concat(rounds, ignore_index=True)
+        return history.sort_values(['round', 'mean_roc_auc'], ascending=[False, False], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validación cruzada y búsqueda de hiperparámetros del modelo de riesgo")
+    parser.add_argument('--data', default=CSV_PATH)
+    parser.add_argument('--search', choices=['grid', 'halving'], default='grid')
+    parser.add_argument('--folds', type=int, default=N_FOLDS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help="CSV opcional con los resultados")
+    args = parser.parse_args(argv)
+
+    df, _ = clean_portfolio(load_portfolio(args.data))
+    X = df[FEATURES].to_numpy(dtype='float64', na_value=np.nan)
+    validator = CrossValidator(X, df['default'], n_folds=args.folds, workers=args.workers)
+    results = validator.grid_search() if args.search == 'grid' else validator.successive_halving()
+
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
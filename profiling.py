@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DESCRIBE_STATS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+HEAD_ROWS = 10
+
+
+# Huella del contenido del archivo de datos (identifica la versión del dataset)
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def profile_path(data_path, data_hash):
+    base = os.path.splitext(data_path)[0]
+    return f"{base}.profile.{data_hash}.json"
+
+
+def _quantile(ordered, q):
+    position = q * (len(ordered) - 1)
+    low = int(np.floor(position))
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+# Un solo ordenamiento por columna da cuantiles, min/max y valores distintos
+def _numeric_profile(series):
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    ordered = np.sort(values[~np.isnan(values)])
+    n = len(ordered)
+    profile = {'missing': int(len(values) - n), 'count': n}
+    if n == 0:
+        profile.update({stat: None for stat in DESCRIBE_STATS[1:]}, distinct=0)
+        return profile
+    profile.update({
+        'mean': float(ordered.mean()),
+        'std': float(ordered.std(ddof=1)) if n > 1 else None,
+        'min': float(ordered[0]),
+        '25%': float(_quantile(ordered, 0.25)),
+        '50%': float(_quantile(ordered, 0.5)),
+        '75%': float(_quantile(ordered, 0.75)),
+        'max': float(ordered[-1]),
+        'distinct': int(1 + np.count_nonzero(ordered[1:] != ordered[:-1])),
+    })
+    return profile
+
+
+def build_profile(df, report=None):
+    report = report or {}
+    malformed = dict(report.get('out_of_range', {}))
+    bad_labels = sum(report.get('malformed_labels', {}).values()) + sum(report.get('unknown_labels', {}).values())
+    if bad_labels:
+        malformed['default'] = malformed.get('default', 0) + bad_labels
+
+    columns = {}
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col].dtype) and not pd.api.types.is_bool_dtype(df[col].dtype):
+            columns[col] = _numeric_profile(df[col])
+            columns[col]['numeric'] = True
+        else:
+            columns[col] = {
+                'missing': int(df[col].isna().sum()),
+                'count': int(df[col].notna().sum()),
+                'distinct': int(df[col].nunique()),
+                'numeric': False,
+            }
+        columns[col]['malformed'] = int(malformed.get(col, 0))
+
+    return {
+        'rows': len(df),
+        'columns': columns,
+        'head': json.loads(df.head(HEAD_ROWS).to_json(orient='split', index=False)),
+    }
+
+
+# Perfil persistido junto a los datos y reutilizado mientras el contenido no cambie
+def load_or_build_profile(df, data_path, data_hash, report=None):
+    path = profile_path(data_path, data_hash)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    profile = build_profile(df, report)
+    profile['data_hash'] = data_hash
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return profile
+
+
+def missing_frame(profile):
+    rows = profile['rows']
+    missing = pd.Series({col: stats['missing'] for col, stats in profile['columns'].items()})
+    missing_df = pd.DataFrame({
+        'Valores_Faltantes': missing,
+        'Porcentaje': (missing / max(rows, 1) * 100).round(2)
+    }).sort_values('Porcentaje', ascending=False)
+    return missing_df[missing_df['Valores_Faltantes'] > 0]
+
+
+def describe_frame(profile):
+    numeric = {col: stats for col, stats in profile['columns'].items() if stats['numeric']}
+    return pd.DataFrame(
+        {col: [stats.get(stat) for stat in DESCRIBE_STATS] for col, stats in numeric.items()},
+        index=DESCRIBE_STATS,
+        dtype='float64'
+    )
+
+
+def head_frame(profile):
+    head = profile['head']
+    return pd.DataFrame(head['data'], columns=head['columns'])
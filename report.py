@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly
+from plotly.offline import get_plotlyjs
+
+from aggregations import DENSITY_BINS, SCATTER_MAX_POINTS, density_grid
+from charts import (
+    NUMERIC_VARS, correlation_figures, correlation_frame, education_figure, income_debt_density_figure,
+    income_debt_points_figure, missing_values_figure, numeric_aggregates, numeric_figures, overview_figures,
+    scatter_3d_figure, scenario_figures, scoring_figures, segment_crosstab_figure, segment_rate_figure
+)
+from cleaning import DEFAULT_CATEGORIES
+from data_store import CSV_PATH
+from ingestion import PORTFOLIO_DIR, PortfolioStore
+from profiling import file_hash, load_or_build_profile, missing_frame
+from sampling import SAMPLE_SIZE
+from scenarios import ScenarioEngine, sample_shocks
+from segments import SEGMENTS
+from shared_cache import cache_key
+from scoring import META_FILE, MODEL_DIR, load_model, model_exists, risk_segment, train_model
+
+REPORT_DIR = 'reporte'
+MANIFEST_FILE = 'manifest.json'
+PLOTLY_JS_FILE = 'plotly.min.js'
+FRAGMENT_DIR = 'fragments'
+
+SECTIONS = {
+    'overview': '📊 Resumen General',
+    'numeric': '📈 Análisis de Variables Numéricas',
+    'correlation': '🔗 Análisis de Correlación',
+    'categorical': '📋 Variables Categóricas',
+    'advanced': '🎯 Análisis Avanzado',
+    'scoring': '🤖 Scoring de Riesgo',
+    'segments': '🧩 Análisis por Segmentos',
+    'scenarios': '🧪 Escenarios de Estrés',
+}
+
+# Secciones que dependen del modelo de riesgo persistido
+MODEL_SECTIONS = ('scoring', 'scenarios')
+
+# Módulos cuyo código define las figuras: si cambian, todas las secciones se regeneran
+CODE_MODULES = ['report.py', 'charts.py', 'aggregations.py', 'correlation.py', 'sampling.py', 'segments.py', 'scoring.py', 'scenarios.py']
+
+# Estado de cada proceso del pool: versión del portafolio y motores construidos una sola vez por worker
+_worker = {}
+
+
+# Variantes del reporte: cartera completa, por estado del préstamo y por tramo de edad
+# (los mismos tramos del segmento de edad; las edades son enteras y los bins cerrados a la derecha)
+def report_variants(bounds):
+    age_range = tuple(int(v) for v in bounds('age'))
+    income_range = tuple(int(v) for v in bounds('income'))
+    variants = [{'slug': 'todos', 'title': 'Cartera completa', 'filters': (None, age_range, income_range)}]
+    for code, label in enumerate(DEFAULT_CATEGORIES):
+        variants.append({
+            'slug': label.lower().replace(' ', '-'),
+            'title': label,
+            'filters': (code, age_range, income_range),
+        })
+    segment = SEGMENTS['age_segment']
+    for low, high, label in zip(segment['bins'][:-1], segment['bins'][1:], segment['labels']):
+        variants.append({
+            'slug': f"edad-{low + 1}-{high}",
+            'title': f"Edad: {label}",
+            'filters': (None, (low + 1, high), income_range),
+        })
+    return variants
+
+
+def code_version():
+    digest = hashlib.blake2b(digest_size=16)
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in CODE_MODULES:
+        with open(os.path.join(base, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Huella de las entradas de una sección: datos, filtros de la variante, código y, para las
+# secciones que usan el modelo, la versión del modelo persistido
+def input_hash(data_hash, section, variant, version, model_hash=None):
+    return cache_key(data_hash, section, variant['filters'], version, model_hash if section in MODEL_SECTIONS else None)
+
+
+def _init_worker(data_path, data_hash, store_dir, model_dir):
+    state = PortfolioStore(store_dir).state(data_hash)
+    _worker.clear()
+    _worker.update({
+        'state': state, 'df': state.df, 'data_path': data_path, 'data_hash': data_hash,
+        'model_dir': model_dir, 'filter_index': state.filter_index,
+    })
+
+
+def _resource(name, build):
+    if name not in _worker:
+        _worker[name] = build()
+    return _worker[name]
+
+
+def overview_section(view):
+    return overview_figures(view)
+
+
+def numeric_section(view):
+    figures = {}
+    for var in NUMERIC_VARS:
+        for name, fig in numeric_figures(*numeric_aggregates(view, var), var).items():
+            figures[f"{var}_{name}"] = fig
+    return figures
+
+
+def correlation_section(view):
+    state = _worker['state']
+    pearson = state.correlation_engine.pearson(state.df, *view.filters)
+    spearman = state.rank_cache.spearman(view.positions)
+    figures = {}
+    for method, matrix in (('Pearson', pearson), ('Spearman', spearman)):
+        for name, fig in correlation_figures(correlation_frame(matrix)).items():
+            fig.update_layout(title=f"{fig.layout.title.text} ({method})")
+            figures[f"{method.lower()}_{name}"] = fig
+    return figures
+
+
+def categorical_section(view):
+    figures = {'education': education_figure(view)}
+    if len(view) <= SCATTER_MAX_POINTS:
+        figures['scatter'] = income_debt_points_figure(view[['income', 'debtinc', 'default_label']])
+    else:
+        figures['scatter'] = income_debt_density_figure(*density_grid(
+            view['income'].to_numpy(dtype='float64', na_value=float('nan')),
+            view['debtinc'].to_numpy(dtype='float64', na_value=float('nan')),
+            view['default'].to_numpy(), n_classes=len(DEFAULT_CATEGORIES), bins=DENSITY_BINS
+        ))
+    return figures
+
+
+def advanced_section(view):
+    state = _worker['state']
+    figures = {'3d': scatter_3d_figure(state.sampler.sample(state.df, *view.filters, size=SAMPLE_SIZE))}
+    profile = _resource('profile', lambda: load_or_build_profile(
+        state.df, _worker['data_path'], _worker['data_hash'], state.report
+    ))
+    missing_df = missing_frame(profile)
+    if not missing_df.empty:
+        figures['missing'] = missing_values_figure(missing_df)
+    return figures
+
+
+def scoring_section(view):
+    risk_model = _resource('model', lambda: load_model(_worker['model_dir']))
+    scores = _worker['state'].scores(risk_model)
+    if view.positions is not None:
+        scores = scores[view.positions]
+    return scoring_figures(scores, view['default'].to_numpy(), risk_segment(scores))
+
+
+def segments_section(view):
+    segments = _worker['state'].segment_engine.query(view.positions, key=view.filters)
+    figures = {name: segment_rate_figure(table, name) for name, table in segments['tables'].items()}
+    for pair, crosstab in segments['crosstabs'].items():
+        figures['__'.join(pair)] = segment_crosstab_figure(crosstab, pair)
+    return figures
+
+
+# Escenarios con los rangos de choque por defecto sobre las filas de la variante
+def scenarios_section(view):
+    risk_model = _resource('model', lambda: load_model(_worker['model_dir']))
+    engine = ScenarioEngine(risk_model, _worker['df'], view.positions)
+    return scenario_figures(engine.run(sample_shocks()), engine.baseline())
+
+
+SECTION_BUILDERS = {
+    'overview': overview_section,
+    'numeric': numeric_section,
+    'correlation': correlation_section,
+    'categorical': categorical_section,
+    'advanced': advanced_section,
+    'scoring': scoring_section,
+    'segments': segments_section,
+    'scenarios': scenarios_section,
+}
+
+
+# Fragmento HTML de una sección: solo los <div> de cada figura, sin plotly.js embebido.
+# Los ids son deterministas para que una sección sin cambios produzca el mismo archivo
+def render_section(section, variant):
+    start = time.perf_counter()
+    df = _worker['df']
+    view = _worker['filter_index'].view(df, *variant['filters'])
+    parts = [f'<section id="{section}"><h2>{html.escape(SECTIONS[section])}</h2>']
+    if view.empty:
+        parts.append('<p class="empty">Sin préstamos para esta variante</p>')
+    else:
+        parts.append('<div class="grid">')
+        for name, fig in SECTION_BUILDERS[section](view).items():
+            parts.append(fig.to_html(
+                full_html=False, include_plotlyjs=False, div_id=f"{variant['slug']}-{section}-{name}",
+                default_width='100%', default_height='450px'
+            ))
+        parts.append('</div>')
+    parts.append('</section>')
+    return '\n'.join(parts), time.perf_counter() - start
+
+
+def _write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'plotly': None, 'jobs': {}}
+
+
+# Quita fragmentos y entradas del manifiesto de trabajos que ya no se generan (variantes o
+# secciones de ejecuciones anteriores), para que no se acumulen en el directorio del reporte
+def prune_fragments(output_dir, manifest, job_ids):
+    for job_id in set(manifest['jobs']) - job_ids:
+        del manifest['jobs'][job_id]
+    for entry in os.scandir(os.path.join(output_dir, FRAGMENT_DIR)):
+        if entry.name.endswith('.html') and entry.name[:-len('.html')] not in job_ids:
+            os.remove(entry.path)
+
+
+# Una sola copia de plotly.js para todas las páginas; se reescribe solo si cambia la versión
+def write_plotly_js(output_dir, manifest):
+    path = os.path.join(output_dir, PLOTLY_JS_FILE)
+    if manifest.get('plotly') != plotly.__version__ or not os.path.exists(path):
+        _write_text(path, get_plotlyjs())
+        manifest['plotly'] = plotly.__version__
+
+
+def page_name(variant, variants):
+    return 'index.html' if variant is variants[0] else f"{variant['slug']}.html"
+
+
+PAGE_STYLE = """
+body { background: #1e1b3a; color: #ffffff; font-family: 'Inter', system-ui, sans-serif; margin: 0 2rem 2rem; }
+nav { display: flex; flex-wrap: wrap; gap: .5rem; margin: 1rem 0; }
+nav a { color: #ffffff; text-decoration: none; padding: .4rem 1rem; border-radius: 20px; background: rgba(255,255,255,.12); }
+nav a.active { background: linear-gradient(45deg, #00f5ff, #ff00f5); }
+section h2 { padding: .75rem 1rem; border-radius: 15px; background: rgba(255,255,255,.1); }
+.grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(520px, 1fr)); gap: 1rem; }
+.empty { opacity: .7; }
+"""
+
+
+def write_page(output_dir, variant, variants, data_hash):
+    links = ''.join(
+        f'<a href="{page_name(other, variants)}" class="{"active" if other is variant else ""}">{html.escape(other["title"])}</a>'
+        for other in variants
+    )
+    anchors = ''.join(f'<a href="#{section}">{html.escape(title)}</a>' for section, title in SECTIONS.items())
+    body = []
+    for section in SECTIONS:
+        fragment = os.path.join(output_dir, FRAGMENT_DIR, f"{variant['slug']}__{section}.html")
+        if os.path.exists(fragment):
+            with open(fragment, encoding='utf-8') as f:
+                body.append(f.read())
+    _write_text(os.path.join(output_dir, page_name(variant, variants)), f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Análisis de Riesgo Crediticio · {html.escape(variant['title'])}</title>
+<script src="{PLOTLY_JS_FILE}"></script>
+<style>{PAGE_STYLE}</style>
+</head>
+<body>
+<h1>ANÁLISIS DE RIESGO CREDITICIO · {html.escape(variant['title'])}</h1>
+<p>Versión de datos {data_hash}</p>
+<nav>{links}</nav>
+<nav>{anchors}</nav>
+{chr(10).join(body)}
+</body>
+</html>
+""")
+
+
+# Genera el reporte estático: cada (variante, sección) es un trabajo independiente del pool y
+# solo se recalculan los que cambiaron de huella desde la última ejecución
+def build_report(data_path=CSV_PATH, output_dir=REPORT_DIR, sections=None, workers=None, force=False,
+                 store_dir=PORTFOLIO_DIR, model_dir=MODEL_DIR):
+    start = time.perf_counter()
+    sections = sections or list(SECTIONS)
+    os.makedirs(os.path.join(output_dir, FRAGMENT_DIR), exist_ok=True)
+    manifest = load_manifest(output_dir)
+    write_plotly_js(output_dir, manifest)
+
+    # Última versión del almacén: los workers leen sus particiones ya limpias
+    store = PortfolioStore(store_dir)
+    store.sync_base(data_path)
+    state = store.state()
+    df, data_hash = state.df, state.version_id
+    variants = report_variants(state.filter_index.bounds)
+    model_hash = None
+    if any(section in MODEL_SECTIONS for section in sections):
+        if not model_exists(model_dir):
+            train_model(df, model_dir)
+        model_hash = file_hash(os.path.join(model_dir, META_FILE))
+
+    version = code_version()
+    pending, skipped = [], 0
+    job_ids = set()
+    for variant in variants:
+        for section in sections:
+            job_id = f"{variant['slug']}__{section}"
+            job_ids.add(job_id)
+            fingerprint = input_hash(data_hash, section, variant, version, model_hash)
+            fragment = os.path.join(output_dir, FRAGMENT_DIR, f"{job_id}.html")
+            if not force and manifest['jobs'].get(job_id) == fingerprint and os.path.exists(fragment):
+                skipped += 1
+                continue
+            pending.append((job_id, section, variant, fingerprint, fragment))
+
+    timings = {}
+
+    def save_fragment(job, result):
+        job_id, _, _, fingerprint, fragment = job
+        text, seconds = result
+        _write_text(fragment, text)
+        manifest['jobs'][job_id] = fingerprint
+        timings[job_id] = round(seconds, 3)
+
+    init_args = (data_path, data_hash, store_dir, model_dir)
+    workers = workers or os.cpu_count() or 1
+    if pending and (workers == 1 or len(pending) == 1):
+        _init_worker(*init_args)
+        for job in pending:
+            save_fragment(job, render_section(job[1], job[2]))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            futures = {pool.submit(render_section, job[1], job[2]): job for job in pending}
+            for future in as_completed(futures):
+                save_fragment(futures[future], future.result())
+    prune_fragments(output_dir, manifest, job_ids)
+
+    for variant in variants:
+        write_page(output_dir, variant, variants, data_hash)
+    _write_text(os.path.join(output_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+    return {
+        'data_hash': data_hash,
+        'pages': len(variants),
+        'rendered': len(pending),
+        'skipped': skipped,
+        'workers': workers,
+        'timings': timings,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera el reporte HTML estático del análisis de riesgo")
+    parser.add_argument('--data', default=CSV_PATH)
+    parser.add_argument('--output', default=REPORT_DIR)
+    parser.add_argument('--sections', nargs='+', choices=list(SECTIONS))
+    parser.add_argument('--workers', type=int, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--force', action='store_true', help="Regenera todas las secciones aunque no hayan cambiado")
+    parser.add_argument('--store', default=PORTFOLIO_DIR)
+    args = parser.parse_args(argv)
+
+    summary = build_report(args.data, args.output, args.sections, args.workers, args.force, args.store)
+    print(
+        f"✅ Reporte en {args.output}/index.html: {summary['pages']} páginas, "
+        f"{summary['rendered']} secciones generadas y {summary['skipped']} sin cambios "
+        f"(versión {summary['data_hash']}, {summary['workers']} procesos, {summary['seconds']:.1f}s)"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
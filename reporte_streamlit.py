@@ -1,11 +1,31 @@
+import os
+import re
+import time
+from functools import wraps
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import matplotlib.colors as mcolors
-from scipy import stats
+
+# charts (y con él plotly) se importa dentro de cada sección: el encabezado, los filtros y los
+# KPIs se pintan sin esperar a plotly, que solo se carga al mostrar la primera gráfica
+from aggregations import HISTOGRAM_BINS, SCATTER_MAX_POINTS, histogram_edges
+from cleaning import DEFAULT_CATEGORIES
+from compact import frame_memory
+from compute_pool import POLL_SECONDS, ComputePool
+from data_store import CSV_PATH
+from filters import AGE_SLIDER_MAX, default_ranges
+from ingestion import PortfolioStore
+from instrumentation import Tracer, activate, active_tracer, span, traced
+from profiling import describe_frame, file_hash, head_frame, load_or_build_profile, missing_frame
+from scenarios import N_SCENARIOS, SHOCK_RANGES, SHOCKS, scenario_summary
+from segments import SEGMENTS
+from shared_cache import SharedCache
+from sketches import histogram_edges as sketch_edges, rebin
+from scoring import load_model, model_exists, train_model
+
+# Hoja de estilos servida junto al script
+CSS_PATH = 'styles.css'
 
 # Configuración de la página
 st.set_page_config(
@@ -15,201 +35,165 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Cargar datos
-@st.cache_data
-def load_data():
+# Caché en disco compartida entre procesos y sesiones (figuras por versión de datos y filtros)
+@st.cache_resource
+def get_shared_cache():
+    return SharedCache()
+
+# Almacén versionado del portafolio: el CSV base es la primera partición y cada lote ingerido
+# después añade una partición inmutable. El almacén conserva en memoria el estado (frame y
+# motores) de las versiones recientes y, ante una versión nueva, procesa solo las filas añadidas
+@st.cache_resource
+def get_portfolio_store():
+    return PortfolioStore()
+
+def portfolio_state(data_hash):
+    return get_portfolio_store().state(data_hash)
+
+# Pool de procesos para los agregados pesados de cada sección: el hilo del script solo envía
+# el trabajo y espera mostrando un marcador, así una sesión calculando no bloquea a las demás
+@st.cache_resource
+def get_compute_pool():
+    return ComputePool()
+
+# Espera el resultado de un trabajo mostrando el tiempo transcurrido en el marcador. Cada
+# actualización del marcador es un punto donde Streamlit puede interrumpir el script si un
+# widget cambió: el ticket se libera igualmente y, si nadie más lo espera, se cancela en la cola
+def await_result(ticket, placeholder):
+    pool = get_compute_pool()
+    start = time.perf_counter()
     try:
-        df = pd.read_csv('Bankloan.csv', sep=';', encoding='utf-8-sig')
-        return df
-    except FileNotFoundError:
-        st.error("El archivo Bankloan.csv no se ha encontrado.")
+        while not ticket.done():
+            placeholder.caption(f"⏳ Calculando… {time.perf_counter() - start:.1f}s")
+            pool.wait([ticket], POLL_SECONDS)
+        return ticket.result()
+    finally:
+        pool.release([ticket])
+
+# Versión de los datos: huella del contenido, recalculada solo si cambia la fecha del archivo
+@st.cache_data
+def data_version(path, mtime):
+    return file_hash(path)
+
+# Perfil de calidad de datos (una vez por versión, persistido junto a los datos)
+@st.cache_data
+def load_profile(_df, _report, data_hash):
+    return load_or_build_profile(_df, CSV_PATH, data_hash, _report)
+
+# Modelo de riesgo: se carga del disco (mmap) y solo se entrena si aún no existe
+@st.cache_resource
+def get_risk_model(data_hash):
+    if model_exists():
+        return load_model()
+    return train_model(portfolio_state(data_hash).df)
+
+# Tracer de la sesión, activo solo con el modo depuración
+def session_tracer():
+    if not st.session_state.get('debug_mode'):
         return None
+    if 'tracer' not in st.session_state:
+        st.session_state.tracer = Tracer()
+    return st.session_state.tracer
 
-# Preprocesamiento de datos
-def preprocess_data(df):
-    # Limpieza de la columna default
-    df['default'] = df['default'].astype(str)
-    mapeo_valores = {'0': 0, '1': 1, "'0'": 0, ":0": 0}
-    df['default'] = df['default'].map(mapeo_valores)
-    df['default'] = df['default'].astype(int)
-    
-    # Crear etiquetas para default
-    df['default_label'] = df['default'].map({0: 'Aprobado', 1: 'No Aprobado'})
-    
-    return df
+# Mide cada sección; un rerun de fragmento corre en otro hilo y abre su propia ejecución
+def instrumented(fn):
+    traced_fn = traced(fn.__name__)(fn)
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        tracer = session_tracer()
+        if tracer is not None and active_tracer() is not tracer:
+            tracer.start_run(f"fragmento {fn.__name__}")
+        activate(tracer)
+        return traced_fn(*args, **kwargs)
+    return wrapper
 
-# Aplicar estilos CSS personalizados con efectos modernos
-def apply_custom_css():
-    st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    .main {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        min-height: 100vh;
-    }
-    
-    
-    
-    .main-header {
-        font-family: 'Inter', sans-serif;
-        font-size: 3.5rem;
-        font-weight: 700;
-        color: #ffffff;
-        text-align: center;
-        margin-bottom: 2rem;
-        text-shadow: 0 4px 15px rgba(0,0,0,0.2);
-        background: linear-gradient(45deg, #fff5ff, #ff00f5);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-    }
-    
-    .section-header {
-        font-family: 'Inter', sans-serif;
-        font-size: 1.8rem;
-        font-weight: 600;
-        color: #ffffff;
-        margin-top: 3rem;
-        margin-bottom: 2rem;
-        padding: 1rem;
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        border-radius: 15px;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        box-shadow: 0 8px 32px rgba(31, 38, 135, 0.37);
-    }
-    
-    .metric-card {
-        background: rgba(255, 255, 255, 0.25);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border-radius: 20px;
-        padding: .2rem;
-        margin: .5rem 0;
-        border: 1px solid rgba(255, 255, 255, 0.18);
-        box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease, box-shadow 0.3s ease;
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 25px 50px rgba(0, 0, 0, 0.15);
-    }
-    
-    .chart-container {
-        background: rgba(255, 255, 255, 0.15);
-        backdrop-filter: blur(15px);
-        -webkit-backdrop-filter: blur(15px);
-        border-radius: 20px;
-        padding: .2rem;
-        margin: .5rem 0;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        box-shadow: 0 15px 35px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease, box-shadow 0.3s ease;
-    }
-    
-    .chart-container:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 20px 40px rgba(0, 0, 0, 0.15);
-    }
-    
-    .stPlotlyChart {
-        border-radius: 15px;
-        overflow: hidden;
-    }
-    
-    .stSelectbox > div > div {
-        background-color: rgba(255, 255, 255, 0.9);
-        border-radius: 10px;
-        border: 2px solid #00f5ff;
-        color: #333;
-    }
-    
-    .stSlider > div > div > div > div {
-        background-color: #00f5ff;
-    }
-    
-    .stButton > button {
-        background: linear-gradient(45deg, #00f5ff, #ff00f5);
-        color: white;
-        border: none;
-        border-radius: 25px;
-        padding: 0.75rem 2rem;
-        font-weight: 600;
-        font-family: 'Inter', sans-serif;
-        transition: all 0.3s ease;
-        box-shadow: 0 10px 25px rgba(0, 245, 255, 0.3);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 15px 30px rgba(0, 245, 255, 0.4);
-    }
-    
-    .sidebar-filter {
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 1rem 0;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-    }
-    
-    .navigation-buttons {
-        display: flex;
-        justify-content: center;
-        gap: 1rem;
-        margin: 2rem 0;
-    }
-    
-    .nav-button {
-        background: rgba(255, 255, 255, 0.2);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255, 255, 255, 0.3);
-        color: white;
-        padding: 0.75rem 1.5rem;
-        border-radius: 25px;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        font-weight: 500;
-    }
-    
-    .nav-button:hover {
-        background: rgba(255, 255, 255, 0.3);
-        transform: translateY(-2px);
-    }
-    
-    .nav-button.active {
-        background: linear-gradient(45deg, #00f5ff, #ff00f5);
-        box-shadow: 0 10px 25px rgba(0, 245, 255, 0.3);
-    }
-    
-    .stMetric {
-        background: transparent;
-    }
-    
-    .stMetric > div {
-        background: transparent;
-    }
-    
-    .stMetric label {
-        color: rgba(255, 255, 255, 0.8) !important;
-        font-size: 0.9rem !important;
-        font-weight: 500 !important;
-    }
-    
-    .stMetric div[data-testid="metric-value"] {
-        color: #ffffff !important;
-        font-size: 2rem !important;
-        font-weight: 700 !important;
-    }
-    
-    .stMetric div[data-testid="metric-delta"] {
-        color: #00f5ff !important;
+# st.plotly_chart con el tamaño del JSON enviado al navegador (solo se serializa en depuración)
+def plotly_chart(fig, **kwargs):
+    if active_tracer() is None:
+        return st.plotly_chart(fig, **kwargs)
+    with span(f"plotly_chart: {fig.layout.title.text or 'figura'}", 'render') as record:
+        record['payload_bytes'] = len(fig.to_json())
+        return st.plotly_chart(fig, **kwargs)
+
+def show_debug_panel():
+    st.sidebar.toggle("🛠️ Modo depuración", key="debug_mode")
+    tracer = session_tracer()
+    if tracer is None:
+        return
+    with st.sidebar.expander("⏱️ Instrumentación", expanded=True):
+        summary = pd.DataFrame(tracer.summary()).T
+        if summary.empty:
+            st.info("Sin mediciones todavía")
+            return
+        st.write(f"**Ejecuciones registradas:** {len(tracer.runs)}")
+        st.dataframe(summary.sort_values('wall_ms', ascending=False).round(1), use_container_width=True)
+        last = pd.DataFrame(tracer.runs[-1]['spans'])
+        st.caption(f"Última ejecución: {tracer.runs[-1]['name']}")
+        st.dataframe(last[['name', 'wall_ms', 'rows', 'memory_delta_bytes', 'payload_bytes']].round(1), use_container_width=True)
+        st.download_button("⬇️ JSON", tracer.to_json(), file_name="instrumentacion.json", mime="application/json")
+        st.download_button("⬇️ Chrome trace", tracer.to_chrome_trace(), file_name="trace.json", mime="application/json")
+        pool = get_compute_pool()
+        st.caption(f"Pool de cómputo: {pool.workers} procesos, {pool.in_flight()} trabajos en curso")
+        st.write(pool.stats)
+
+# Etiqueta del selector de versiones -> id de versión (la más reciente primero)
+def version_labels(store):
+    return {
+        f"{v['id']} · {v['created'].replace('T', ' ')[:16]} · {v['rows']:,} filas": v['id']
+        for v in reversed(store.versions())
     }
-    </style>
-    """, unsafe_allow_html=True)
+
+# Versiones del almacén: fijar una versión para la sesión y compararla con otra
+def show_version_panel(store, data_hash):
+    versions = version_labels(store)
+    with st.sidebar.expander("🗂️ Versiones de Datos"):
+        st.write(f"**En uso:** {data_hash} ({len(versions)} disponibles)")
+        st.selectbox(
+            "Fijar versión", ["Última versión"] + list(versions), key="version_choice",
+            help="Las particiones son inmutables: una versión fijada no cambia aunque lleguen lotes nuevos"
+        )
+        others = [label for label, version in versions.items() if version != data_hash]
+        if not others:
+            return
+        other = versions[st.selectbox("Comparar con", others, key="version_compare")]
+        older, newer = sorted((other, data_hash), key=lambda v: store.version(v)['number'])
+        st.dataframe(store.compare(older, newer).style.format("{:,.4g}"), use_container_width=True)
+        added = store.changes(older, newer)
+        st.caption(f"Particiones añadidas en {newer}: {', '.join(p['source'] for p in added)}")
+
+def show_validation_report(report, memory=None):
+    issues = report['dropped_rows'] or report['malformed_labels'] or report['malformed_values'] or report['out_of_range']
+    with st.sidebar.expander("🧹 Calidad de Datos", expanded=bool(report['dropped_rows'])):
+        st.write(f"**Filas:** {report['rows']:,}")
+        if memory is not None:
+            st.write(f"**Memoria:** {memory['bytes'] / 1024 ** 2:,.1f} MB ({memory['bytes_per_row']:.1f} bytes/fila)")
+        if report['malformed_labels']:
+            st.write("**Etiquetas de default corregidas:**", report['malformed_labels'])
+        if report['unknown_labels'] or report['missing_default']:
+            st.write("**Etiquetas de default no reconocidas:**", report['unknown_labels'])
+            st.write(f"**Filas descartadas:** {report['dropped_rows']:,}")
+        if report['malformed_values']:
+            st.write("**Valores no numéricos o no enteros (quedan nulos):**", report['malformed_values'])
+        if report['nan_counts']:
+            st.write("**Valores faltantes:**", report['nan_counts'])
+        if report['out_of_range']:
+            st.write("**Valores fuera de rango:**", report['out_of_range'])
+        if not issues:
+            st.write("Sin incidencias de validación")
+
+# Hoja de estilos de la app: se lee y compacta una vez por proceso y se inyecta con st.html, que
+# la manda al contenedor de eventos (no ocupa espacio en la página). Sin @import de fuentes remotas
+@st.cache_resource
+def load_css(path=CSS_PATH):
+    with open(path, encoding='utf-8') as f:
+        css = f.read()
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', re.sub(r'\s+', ' ', css))
+    css = re.sub(r':\s+', ':', css)
+    return f"<style>{css.strip()}</style>"
+
+def apply_custom_css():
+    st.html(load_css())
 
 # Función principal
 def main():
@@ -217,13 +201,24 @@ def main():
     
     st.markdown('<h1 class="main-header">ANÁLISIS DE RIESGO CREDITICIO</h1>', unsafe_allow_html=True)
     
-    # Cargar datos
-    df = load_data()
-    if df is None:
-        return
+    # Instrumentación por etapa (modo depuración del sidebar)
+    tracer = session_tracer()
+    if tracer is not None:
+        tracer.start_run("rerun")
+    activate(tracer)
     
-    # Preprocesar datos
-    df = preprocess_data(df)
+    # Cargar datos: el CSV base se sincroniza con el almacén y se usa la versión fijada en la
+    # sesión o la última ingerida (solo se limpian y procesan las particiones nuevas)
+    store = get_portfolio_store()
+    try:
+        store.sync_base(CSV_PATH, data_version(CSV_PATH, os.path.getmtime(CSV_PATH)))
+    except FileNotFoundError:
+        st.error("El archivo Bankloan.csv no se ha encontrado.")
+        return
+    except ImportError as e:
+        st.error(f"No se puede cargar el portafolio: {e}")
+        return
+    pinned = version_labels(store).get(st.session_state.get('version_choice'))
     
     # Inicializar estado de sesión para navegación
     if 'chart_section' not in st.session_state:
@@ -233,6 +228,27 @@ def main():
     st.sidebar.markdown('<div class="sidebar-filter">', unsafe_allow_html=True)
     st.sidebar.title("🔍 Filtros Inteligentes")
     
+    # Modo aproximado: se lee antes de cargar datos; activo, solo se leen los sketches de la
+    # versión (sin particiones, frame ni índices), así sirve carteras que no caben en memoria
+    approximate = st.sidebar.toggle(
+        "⚡ Modo aproximado",
+        key="approx_mode",
+        help="Cuantiles, histogramas y métricas desde sketches fusionables, sin cargar el dataset"
+    )
+    with span('preprocess_data') as record:
+        state = store.sketch_state(pinned) if approximate else store.state(pinned)
+        df, validation_report, data_hash = state.df, state.report, state.version_id
+        if record is not None:
+            record['rows'] = state.version['rows']
+    if approximate:
+        sketches = state.sketches
+        bounds = sketches.bounds
+    else:
+        with span('build_indexes', rows=len(df)):
+            filter_index = state.filter_index
+            kpi_cube = state.kpi_cube
+        bounds = filter_index.bounds
+    
     # Filtros interactivos con colores personalizados
     default_filter = st.sidebar.selectbox(
         "🏦 Estado del Préstamo",
@@ -240,61 +256,68 @@ def main():
     )
     
     # Modificado: rango de edad hasta 100 años
+    default_age, default_income = default_ranges(bounds)
     age_range = st.sidebar.slider(
         "👤 Rango de Edad",
         min_value=18,
-        max_value=65,
-        value=(int(df['age'].min()), min(int(df['age'].max()), 65))
+        max_value=AGE_SLIDER_MAX,
+        value=default_age
     )
     
     income_range = st.sidebar.slider(
         "💰 Rango de Ingresos",
-        min_value=int(df['income'].min()),
-        max_value=int(df['income'].max()),
-        value=(int(df['income'].min()), int(df['income'].max()))
+        min_value=default_income[0],
+        max_value=default_income[1],
+        value=default_income
     )
     
     st.sidebar.markdown('</div>', unsafe_allow_html=True)
     
-    # Aplicar filtros
-    filtered_df = df.copy()
+    show_version_panel(store, data_hash)
+    show_validation_report(validation_report, None if approximate else frame_memory(df))
     
+    # Aplicar filtros (búsqueda binaria sobre índices ordenados, sin copiar el frame)
+    default_value = None
     if default_filter != "Todos":
         default_value = 0 if default_filter == "Aprobado" else 1
-        filtered_df = filtered_df[filtered_df['default'] == default_value]
     
-    filtered_df = filtered_df[
-        (filtered_df['income'] >= income_range[0]) & 
-        (filtered_df['income'] <= income_range[1]) &
-        (filtered_df['age'] >= age_range[0]) & 
-        (filtered_df['age'] <= age_range[1])
-    ]
+    if approximate:
+        filtered_df = None
+        with span('sketches.kpis'):
+            kpis = sketches.kpis(default_value)
+    else:
+        with span('filter', rows=len(df)):
+            filtered_df = filter_index.view(df, default_value, age_range, income_range)
+        with span('kpi_cube.query', rows=len(filtered_df)):
+            kpis = kpi_cube.query(df, default_value, age_range, income_range)
     
     # KPIs con efecto glassmorphism
     st.markdown('<h2 class="section-header">📈 Métricas Clave</h2>', unsafe_allow_html=True)
+    if approximate:
+        st.caption("⚡ Modo aproximado: métricas desde sketches; los rangos de edad e ingresos no se aplican.")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Préstamos", f"{len(filtered_df):,}")
+        st.metric("Total Préstamos", f"{kpis['count']:,}")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        tasa_default = filtered_df['default'].mean() * 100
+        tasa_default = kpis['mean']['default'] * 100
         st.metric("Tasa de Default", f"{tasa_default:.2f}%")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        ingreso_promedio = filtered_df['income'].mean()
+        ingreso_promedio = kpis['mean']['income']
         st.metric("Ingreso Promedio", f"${ingreso_promedio:,.0f}")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        edad_promedio = filtered_df['age'].mean()
+        edad_promedio = kpis['mean']['age']
         st.metric("Edad Promedio", f"{edad_promedio:.1f} años")
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -303,7 +326,7 @@ def main():
     <div class="navigation-buttons">
     """, unsafe_allow_html=True)
     
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6, col7, col8 = st.columns(8)
     
     with col1:
         if st.button("📊 Resumen General"):
@@ -325,270 +348,253 @@ def main():
         if st.button("🎯 Análisis Avanzado"):
             st.session_state.chart_section = 'advanced'
     
+    with col6:
+        if st.button("🤖 Scoring"):
+            st.session_state.chart_section = 'scoring'
+    
+    with col7:
+        if st.button("🧩 Segmentos"):
+            st.session_state.chart_section = 'segments'
+    
+    with col8:
+        if st.button("🧪 Escenarios"):
+            st.session_state.chart_section = 'scenarios'
+    
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Mostrar gráficos según la sección seleccionada
-    if st.session_state.chart_section == 'overview':
-        show_overview_charts(filtered_df)
+    # Mostrar gráficos según la sección seleccionada: solo se calcula la sección activa y
+    # cada sección es un fragmento que se re-ejecuta sola cuando cambian sus propios widgets
+    if approximate:
+        show_approximate_section(st.session_state.chart_section, sketches, default_value)
+    elif st.session_state.chart_section == 'overview':
+        show_overview_charts(filtered_df, data_hash)
     elif st.session_state.chart_section == 'numeric':
-        show_numeric_charts(filtered_df)
+        show_numeric_charts(filtered_df, data_hash)
     elif st.session_state.chart_section == 'correlation':
-        show_correlation_charts(filtered_df)
+        show_correlation_charts(filtered_df, data_hash)
     elif st.session_state.chart_section == 'categorical':
-        show_categorical_charts(filtered_df)
+        show_categorical_charts(filtered_df, data_hash)
     elif st.session_state.chart_section == 'advanced':
-        show_advanced_charts(filtered_df, df)
+        show_advanced_charts(filtered_df, df, validation_report, data_hash)
+    elif st.session_state.chart_section == 'scoring':
+        show_scoring_charts(filtered_df, data_hash)
+    elif st.session_state.chart_section == 'segments':
+        show_segment_charts(filtered_df, data_hash)
+    elif st.session_state.chart_section == 'scenarios':
+        show_scenario_charts(filtered_df, data_hash)
+    
+    show_debug_panel()
+    
+    # Con la página ya enviada, un proceso del pool arranca y carga esta versión en segundo plano
+    if not approximate:
+        get_compute_pool().warm(data_hash)
+
+# Modo aproximado: solo las secciones que se calculan desde los sketches; el resto necesita las
+# filas del portafolio
+def show_approximate_section(section, sketches, default_value):
+    if section == 'numeric':
+        show_approximate_numeric_charts(sketches, default_value)
+    elif section == 'advanced':
+        show_approximate_advanced_charts(sketches, default_value)
+    else:
+        st.info("⚡ Esta sección necesita las filas del portafolio: desactiva el modo aproximado para verla.")
 
-def show_overview_charts(filtered_df):
+@st.fragment
+@instrumented
+def show_overview_charts(filtered_df, data_hash):
+    from charts import cached_figures, overview_figures
     st.markdown('<h2 class="section-header">📊 Resumen General</h2>', unsafe_allow_html=True)
     
+    # Figuras compartidas entre sesiones por versión de datos y estado de los filtros
+    figures = cached_figures(
+        get_shared_cache(), (data_hash, 'overview', filtered_df.filters), overview_figures, filtered_df
+    )
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Distribución de defaults con colores personalizados
-        default_distribution = filtered_df['default_label'].value_counts()
-        fig_default = px.pie(
-            values=default_distribution.values,
-            names=default_distribution.index,
-            title="Distribución de Préstamos",
-            color=default_distribution.index,
-            color_discrete_map={'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'}
-        )
-        fig_default.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-        fig_default.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12)
-        )
-        st.plotly_chart(fig_default, use_container_width=True)
+        plotly_chart(figures['default'], use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Distribución de ingresos
-        fig_income = px.histogram(
-            filtered_df, 
-            x='income', 
-            nbins=30,
-            title='Distribución de Ingresos',
-            color_discrete_sequence=['#00f5ff']
-        )
-        fig_income.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            xaxis_title="Ingresos",
-            yaxis_title="Frecuencia"
-        )
-        st.plotly_chart(fig_income, use_container_width=True)
+        plotly_chart(figures['income'], use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-def show_numeric_charts(filtered_df):
+@st.fragment
+@instrumented
+def show_numeric_charts(filtered_df, data_hash):
+    from charts import NUMERIC_VARS, numeric_figures
     st.markdown('<h2 class="section-header">📈 Análisis de Variables Numéricas</h2>', unsafe_allow_html=True)
     
-    numeric_vars = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt']
-    selected_var = st.selectbox("Selecciona una variable:", numeric_vars, key="numeric_var")
+    selected_var = st.selectbox("Selecciona una variable:", NUMERIC_VARS, key="numeric_var")
+    
+    # Histograma por estado de préstamo y box plot (conteos y cuartiles calculados en el pool)
+    slot = st.empty()
+    ticket = get_compute_pool().submit('numeric', data_hash, filtered_df.filters, selected_var=selected_var)
+    edges, counts, summaries = await_result(ticket, slot)
+    figures = numeric_figures(edges, counts, summaries, selected_var)
+    
+    with slot.container():
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['histogram'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+        with col2:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['box'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+# Histograma y box plot desde los sketches: solo se aplica el filtro de estado del préstamo
+@st.fragment
+@instrumented
+def show_approximate_numeric_charts(sketches, default_value):
+    from charts import NUMERIC_VARS, box_figure, class_histogram_figure
+    st.markdown('<h2 class="section-header">📈 Análisis de Variables Numéricas</h2>', unsafe_allow_html=True)
+    
+    selected_var = st.selectbox("Selecciona una variable:", NUMERIC_VARS, key="numeric_var")
+    classes = [(code, label) for code, label in enumerate(DEFAULT_CATEGORIES) if default_value in (None, code)]
+    epsilon = sketches.epsilon(default_value)
+    st.caption(
+        f"⚡ Modo aproximado: cuantiles con error de rango ≤ ±{epsilon:.3%} de las filas; "
+        f"histograma con bins fijos reagrupados. Los rangos de edad e ingresos no se aplican."
+    )
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Histograma por estado de préstamo
-        fig_hist = px.histogram(
-            filtered_df, 
-            x=selected_var, 
-            color='default_label',
-            title=f'Distribución de {selected_var}',
-            color_discrete_map={'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'},
-            barmode='overlay',
-            opacity=0.7
-        )
-        fig_hist.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12)
+        fine_edges = sketch_edges(selected_var)
+        edges = histogram_edges(np.array(sketches.bounds(selected_var)), bins=HISTOGRAM_BINS)
+        counts = {code: rebin(fine_edges, sketches.histogram(selected_var, code), edges) for code, _ in classes}
+        fig_hist = class_histogram_figure(
+            edges, counts, f'Distribución de {selected_var} (aproximada)', selected_var, classes=classes
         )
-        st.plotly_chart(fig_hist, use_container_width=True)
+        plotly_chart(fig_hist, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Box plot
-        fig_box = px.box(
-            filtered_df, 
-            x='default_label', 
-            y=selected_var,
-            title=f'Box Plot de {selected_var}',
-            color='default_label',
-            color_discrete_map={'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'}
-        )
-        fig_box.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12)
-        )
-        st.plotly_chart(fig_box, use_container_width=True)
+        summaries = []
+        for code, label in classes:
+            sketch = sketches.sketch(selected_var, code)
+            if sketch.n == 0:
+                continue
+            q1, median, q3 = sketch.quantile([0.25, 0.5, 0.75])
+            lowerfence, upperfence = sketch.nearest_within(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+            summaries.append((label, {
+                'q1': q1, 'median': median, 'q3': q3, 'lowerfence': lowerfence, 'upperfence': upperfence
+            }))
+        fig_box = box_figure(summaries, selected_var, f'Box Plot de {selected_var} (aproximado)')
+        plotly_chart(fig_box, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-def show_correlation_charts(filtered_df):
+@st.fragment
+@instrumented
+def show_correlation_charts(filtered_df, data_hash):
+    from charts import correlation_figures
     st.markdown('<h2 class="section-header">🔗 Análisis de Correlación</h2>', unsafe_allow_html=True)
     
-    numeric_vars = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt', 'default']
+    method = st.radio("Método de correlación:", ["Pearson", "Spearman"], horizontal=True, key="corr_method")
     
-    col1, col2 = st.columns(2)
+    # Matriz de correlación a partir de estadísticos suficientes (sin recorrer todas las filas)
+    slot = st.empty()
+    with span('correlation_matrix', rows=len(filtered_df)):
+        ticket = get_compute_pool().submit('correlation', data_hash, filtered_df.filters, method=method)
+        corr_matrix = await_result(ticket, slot)
+    figures = correlation_figures(corr_matrix)
     
-    with col1:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Matriz de correlación mejorada
-        corr_matrix = filtered_df[numeric_vars].corr()
-        
-        # Redondear a 2 decimales
-        corr_matrix_rounded = corr_matrix.round(2)
-        
-        fig_corr = px.imshow(
-            corr_matrix_rounded,
-            title="Matriz de Correlación",
-            aspect="auto",
-            color_continuous_scale=['#ff6b6b','white', '#00f5ff'],
-            text_auto=True# Mostrar valores en las celdas
-        )
-        fig_corr.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=10)
-        )
-        fig_corr.update_traces(
-            textfont=dict(color='black', size=10)
-        )
-        st.plotly_chart(fig_corr, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    with slot.container():
+        col1, col2 = st.columns(2)
     
-    with col2:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Correlación con default
-        default_corr = corr_matrix['default'].drop('default').sort_values(key=abs, ascending=False)
-        
-        fig_default_corr = px.bar(
-            x=default_corr.index,
-            y=default_corr.values.round(2),
-            title='Correlación con Default',
-            color=default_corr.values,
-            color_continuous_scale=['#ff6b6b','white', '#00f5ff'],
-        )
-        fig_default_corr.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12),
-            xaxis_title="Variables",
-            yaxis_title="Correlación"
-        )
-        st.plotly_chart(fig_default_corr, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        with col1:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['matrix'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+        with col2:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['default'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
 
-def show_categorical_charts(filtered_df):
+@st.fragment
+@instrumented
+def show_categorical_charts(filtered_df, data_hash):
+    from charts import education_figure, income_debt_density_figure, income_debt_points_figure
     st.markdown('<h2 class="section-header">📋 Variables Categóricas</h2>', unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Distribución por educación
         if 'ed' in filtered_df.columns:
-            ed_distribution = filtered_df['ed'].value_counts().sort_index()
-            fig_ed = px.bar(
-                x=ed_distribution.index.astype(str),
-                y=ed_distribution.values,
-                title='Distribución por Nivel Educativo',
-                color=ed_distribution.values,
-                color_continuous_scale=['#ff6b6b','white', '#00f5ff']
-            )
-            fig_ed.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12)
-            )
-            st.plotly_chart(fig_ed, use_container_width=True)
+            plotly_chart(education_figure(filtered_df), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Scatter plot ingresos vs deuda
-        fig_scatter = px.scatter(
-            filtered_df,
-            x='income',
-            y='debtinc',
-            color='default_label',
-            title='Ingresos vs Ratio de Deuda',
-            color_discrete_map={'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'},
-            opacity=0.7
-        )
-        fig_scatter.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white', size=12)
-        )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        # Scatter plot ingresos vs deuda: marcadores si hay pocos puntos, densidad si hay muchos
+        income = filtered_df['income'].to_numpy(dtype='float64', na_value=np.nan)
+        debtinc = filtered_df['debtinc'].to_numpy(dtype='float64', na_value=np.nan)
+    
+        # Zoom: la rejilla se recalcula a resolución completa dentro de la ventana elegida
+        x_range, y_range = None, None
+        if len(filtered_df) > 0 and not np.isnan(income).all():
+            with st.expander("🔍 Zoom del gráfico"):
+                x_range = st.slider(
+                    "Ingresos", float(np.nanmin(income)), float(np.nanmax(income)),
+                    (float(np.nanmin(income)), float(np.nanmax(income)))
+                )
+                y_range = st.slider(
+                    "Ratio de Deuda", float(np.nanmin(debtinc)), float(np.nanmax(debtinc)),
+                    (float(np.nanmin(debtinc)), float(np.nanmax(debtinc)))
+                )
+            in_window = (income >= x_range[0]) & (income <= x_range[1]) & (debtinc >= y_range[0]) & (debtinc <= y_range[1])
+        else:
+            in_window = np.zeros(len(filtered_df), dtype=bool)
+    
+        if in_window.sum() <= SCATTER_MAX_POINTS:
+            fig_scatter = income_debt_points_figure(filtered_df[['income', 'debtinc', 'default_label']][in_window])
+        else:
+            slot = st.empty()
+            ticket = get_compute_pool().submit(
+                'density', data_hash, filtered_df.filters, x_range=x_range, y_range=y_range
+            )
+            fig_scatter = income_debt_density_figure(*await_result(ticket, slot))
+            slot.empty()
+        plotly_chart(fig_scatter, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-def show_advanced_charts(filtered_df, df):
+@st.fragment
+@instrumented
+def show_advanced_charts(filtered_df, df, validation_report=None, data_hash=None):
+    from charts import missing_values_figure, scatter_3d_figure
     st.markdown('<h2 class="section-header">🎯 Análisis Avanzado</h2>', unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Gráfico 3D
+        # Gráfico 3D sobre una muestra estratificada fija por filtro
         if all(col in filtered_df.columns for col in ['age', 'income', 'debtinc', 'default_label']):
-            fig_3d = px.scatter_3d(
-                filtered_df.sample(min(500, len(filtered_df))),  # Limitar puntos para performance
-                x='age',
-                y='income',
-                z='debtinc',
-                color='default_label',
-                title='Análisis 3D: Edad, Ingresos, Deuda',
-                color_discrete_map={'Aprobado': '#00f5ff', 'No Aprobado': '#ff6b6b'},
-                opacity=0.7
-            )
-            fig_3d.update_layout(
-                scene=dict(
-                    bgcolor='rgba(0,0,0,0)',
-                    xaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white'),
-                    yaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white'),
-                    zaxis=dict(backgroundcolor='rgba(0,0,0,0)', gridcolor='white')
-                ),
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12)
-            )
-            st.plotly_chart(fig_3d, use_container_width=True)
+            slot = st.empty()
+            sample = await_result(get_compute_pool().submit('sample_3d', data_hash, filtered_df.filters), slot)
+            with slot.container():
+                plotly_chart(scatter_3d_figure(sample), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        # Análisis de valores faltantes
-        missing_values = df.isnull().sum()
-        missing_percentage = (missing_values / len(df)) * 100
-        missing_df = pd.DataFrame({
-            'Valores_Faltantes': missing_values, 
-            'Porcentaje': missing_percentage.round(2)
-        }).sort_values('Porcentaje', ascending=False)
-        missing_df = missing_df[missing_df['Valores_Faltantes'] > 0]
-        
+        # Análisis de valores faltantes (desde el perfil cacheado, no sobre el frame completo)
+        profile = load_profile(df, validation_report, data_hash)
+        missing_df = missing_frame(profile)
+    
         if not missing_df.empty:
-            fig_missing = px.bar(
-                missing_df,
-                x=missing_df.index,
-                y='Porcentaje',
-                title='Valores Faltantes (%)',
-                color='Porcentaje',
-                color_continuous_scale='Reds'
-            )
-            fig_missing.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white', size=12)
-            )
-            st.plotly_chart(fig_missing, use_container_width=True)
+            plotly_chart(missing_values_figure(missing_df), use_container_width=True)
         else:
             st.info("No hay valores faltantes en el dataset")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -597,14 +603,192 @@ def show_advanced_charts(filtered_df, df):
     with st.expander("🔍 Ver información detallada del dataset"):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.subheader("📊 Información del Dataset")
-        st.write(f"**Dimensiones:** {df.shape[0]:,} filas x {df.shape[1]} columnas")
-        
+        st.write(f"**Dimensiones:** {profile['rows']:,} filas x {len(profile['columns'])} columnas")
+    
         st.subheader("📈 Estadísticas Descriptivas")
-        st.dataframe(df.describe().round(2), use_container_width=True)
-        
+        st.dataframe(describe_frame(profile).round(2), use_container_width=True)
+    
+        st.subheader("🧪 Calidad por Columna")
+        quality = pd.DataFrame(profile['columns']).T[['missing', 'distinct', 'malformed']]
+        st.dataframe(quality, use_container_width=True)
+    
         st.subheader("👀 Muestra del Dataset")
-        st.dataframe(df.head(10), use_container_width=True)
+        st.dataframe(head_frame(profile), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+# Análisis avanzado sin filas: faltantes y estadísticas descriptivas desde los sketches (el
+# gráfico 3D y la muestra del dataset necesitan el frame)
+@st.fragment
+@instrumented
+def show_approximate_advanced_charts(sketches, default_value):
+    from charts import missing_values_figure
+    st.markdown('<h2 class="section-header">🎯 Análisis Avanzado</h2>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    missing_df = missing_frame(sketches.missing_profile())
+    if not missing_df.empty:
+        plotly_chart(missing_values_figure(missing_df), use_container_width=True)
+    else:
+        st.info("No hay valores faltantes en el dataset")
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    with st.expander("🔍 Ver información detallada del dataset"):
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        st.subheader("📊 Información del Dataset")
+        st.write(f"**Dimensiones:** {sketches.rows:,} filas, {len(sketches.columns)} columnas numéricas con sketch")
+    
+        st.subheader("📈 Estadísticas Descriptivas")
+        st.caption(f"⚡ Aproximadas desde sketches (error de rango ≤ ±{sketches.epsilon(default_value):.3%})")
+        st.dataframe(sketches.describe(default_value).round(2), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@instrumented
+def show_scoring_charts(filtered_df, data_hash):
+    from charts import figures_from_json
+    st.markdown('<h2 class="section-header">🤖 Scoring de Riesgo</h2>', unsafe_allow_html=True)
+    
+    # El modelo se entrena (si hace falta) aquí; los procesos del pool lo cargan del disco
+    slot = st.empty()
+    try:
+        risk_model = get_risk_model(data_hash)
+        scoring = await_result(get_compute_pool().submit('scoring', data_hash, filtered_df.filters), slot)
+    except ImportError as e:
+        slot.warning(f"El scoring no está disponible: {e}")
+        return
+    figures = figures_from_json(scoring['figures'])
+    
+    with slot.container():
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Probabilidad de Default Promedio", f"{scoring['mean'] * 100:.2f}%" if scoring['mean'] is not None else "-")
+        with col2:
+            st.metric("Clientes Alto Riesgo", f"{scoring['high_risk']:,}")
+        with col3:
+            accuracy = risk_model.metadata.get('holdout_accuracy')
+            st.metric("Precisión del Modelo (holdout)", f"{accuracy:.2%}" if accuracy is not None else "-")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['scores'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+        with col2:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            plotly_chart(figures['segments'], use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@instrumented
+def show_segment_charts(filtered_df, data_hash):
+    from charts import SEGMENT_NAMES, segment_crosstab_figure, segment_rate_figure
+    st.markdown('<h2 class="section-header">🧩 Análisis por Segmentos</h2>', unsafe_allow_html=True)
+    
+    slot = st.empty()
+    segments = await_result(get_compute_pool().submit('segments', data_hash, filtered_df.filters), slot)
+    slot.empty()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        segment_labels = {SEGMENT_NAMES[name]: name for name in SEGMENTS}
+        segment = segment_labels[st.selectbox("Segmentación:", list(segment_labels), key="segment_name")]
+        table = segments['tables'][segment]
+        plotly_chart(segment_rate_figure(table, segment), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        pair_labels = {f"{SEGMENT_NAMES[a]} × {SEGMENT_NAMES[b]}": (a, b) for a, b in segments['crosstabs']}
+        pair = pair_labels[st.selectbox("Tabla cruzada:", list(pair_labels), key="segment_pair")]
+        plotly_chart(segment_crosstab_figure(segments['crosstabs'][pair], pair), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("### 📋 Tabla de Segmentos")
+    st.dataframe(table.style.format({
+        'Tasa_Default': '{:.2%}', 'IC_Inferior': '{:.2%}', 'IC_Superior': '{:.2%}'
+    }), use_container_width=True)
+
+
+@st.fragment
+@instrumented
+def show_scenario_charts(filtered_df, data_hash):
+    from charts import scenario_figures
+    st.markdown('<h2 class="section-header">🧪 Escenarios de Estrés</h2>', unsafe_allow_html=True)
+    
+    # Rango de cada choque (%): los escenarios se reparten por hipercubo latino dentro de los rangos
+    columns = st.columns(len(SHOCKS) + 1)
+    ranges = {}
+    for column, (name, label) in zip(columns, SHOCKS.items()):
+        with column:
+            low, high = SHOCK_RANGES[name]
+            values = st.slider(f"{label} (%)", -50, 50, (int(low * 100), int(high * 100)), key=f"shock_{name}")
+            ranges[name] = (values[0] / 100, values[1] / 100)
+    with columns[-1]:
+        n_scenarios = st.slider("Escenarios", 50, 1000, N_SCENARIOS, step=50, key="n_scenarios")
+    
+    # Mover un slider interrumpe la espera: el envío anterior se cancela si sigue en la cola
+    slot = st.empty()
+    try:
+        get_risk_model(data_hash)
+        with span('scenario_results', rows=len(filtered_df)):
+            ticket = get_compute_pool().submit(
+                'scenarios', data_hash, filtered_df.filters, ranges=tuple(ranges.items()), n_scenarios=n_scenarios
+            )
+            baseline, results, rows, scored = await_result(ticket, slot)
+    except ImportError as e:
+        slot.warning(f"Los escenarios no están disponibles: {e}")
+        return
+    slot.empty()
+    if rows == 0:
+        st.info("Sin préstamos para los filtros seleccionados")
+        return
+    if scored < rows:
+        st.caption(
+            f"Escenarios sobre una muestra reproducible de {scored:,} de {rows:,} préstamos; "
+            f"los conteos se escalan a la cartera filtrada."
+        )
+    
+    summary = scenario_summary(results)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Tasa de Default sin Choques", f"{baseline['Tasa de Default'] * 100:.2f}%")
+    with col2:
+        p95 = summary.loc['Tasa de Default', 'P95']
+        st.metric(
+            "Tasa de Default P95", f"{p95 * 100:.2f}%",
+            delta=f"{(p95 - baseline['Tasa de Default']) * 100:+.2f} pp", delta_color="inverse"
+        )
+    with col3:
+        p95 = summary.loc['Clientes Alto Riesgo', 'P95']
+        st.metric(
+            "Clientes Alto Riesgo P95", f"{p95:,.0f}",
+            delta=f"{p95 - baseline['Clientes Alto Riesgo']:+,.0f}", delta_color="inverse"
+        )
+    
+    figures = scenario_figures(results, baseline)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        plotly_chart(figures['distribution'], use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+        plotly_chart(figures['sensitivity'], use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("### 📋 Percentiles por KPI")
+    summary.insert(0, 'Sin Choques', baseline[summary.index])
+    st.dataframe(summary.style.format('{:,.4f}', subset=pd.IndexSlice[['Tasa de Default'], :]).format(
+        '{:,.0f}', subset=pd.IndexSlice[['Clientes Alto Riesgo', 'Alto Riesgo (modelo)'], :]
+    ), use_container_width=True)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import DEFAULT_CATEGORIES
+from compact import position_dtype
+
+SAMPLE_COLUMNS = ['age', 'income', 'debtinc', 'default']
+SAMPLE_SIZE = 500
+SAMPLE_SEED = 42
+
+# Filas que se conservan por celda de la rejilla de filtros: al menos el tamaño de la muestra,
+# así las SAMPLE_SIZE filas de clave más pequeña de cualquier unión de celdas están guardadas
+CELL_RESERVOIR = SAMPLE_SIZE
+
+# Resultados de consultas recientes que se conservan
+QUERY_CACHE_SIZE = 32
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+# Clave pseudoaleatoria reproducible por posición de fila (splitmix64): la muestra no depende
+# del tamaño de los bloques ni del orden en que lleguen
+def row_keys(positions, seed=SAMPLE_SEED):
+    with np.errstate(over='ignore'):
+        z = positions.astype(np.uint64) * _GOLDEN + np.uint64(seed) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype('float64') / float(1 << 53)
+
+
+# Cupo de filas por clase: partes iguales y lo que una clase no puede llenar pasa a la otra
+def class_quotas(available, size):
+    quotas = [min(n, size // len(available)) for n in available]
+    left = size - sum(quotas)
+    for i, n in enumerate(available):
+        extra = min(left, n - quotas[i])
+        quotas[i] += extra
+        left -= extra
+    return quotas
+
+
+# Los quota elementos de clave más pequeña, en orden de clave: selección parcial y solo se
+# ordenan los elegidos (las claves son únicas por posición salvo colisiones improbables)
+def smallest_keys(items, keys, quota):
+    if quota < len(items):
+        top = np.argpartition(keys, quota - 1)[:quota] if quota else np.empty(0, dtype=np.int64)
+        items, keys = items[top], keys[top]
+    return items[np.argsort(keys, kind='stable')]
+
+
+# Muestra estratificada por default y celda de filtros: cada celda guarda las posiciones de sus
+# filas con las claves más pequeñas (bottom-k), que es un reservorio uniforme y fusionable en una
+# pasada. Los valores se leen del frame solo para las filas elegidas
+class StratifiedSampler:
+    def __init__(self, grid, reservoir_size=CELL_RESERVOIR, seed=SAMPLE_SEED):
+        self.grid = grid
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        self.cells = np.empty(0, dtype=grid.cells.dtype)
+        self.positions = np.empty(0, dtype=np.int32)
+        self._cache = {}
+
+    # Un bloque del portafolio; offset es la posición global de su primera fila
+    def add_chunk(self, chunk, offset=0):
+        cells, positions, *_ = self.grid.assign(chunk, offset)
+        cells = np.concatenate([self.cells, cells])
+        positions = np.concatenate([self.positions, positions])
+
+        # Orden por celda y clave; se conservan las primeras reservoir_size filas de cada celda
+        order = np.lexsort((row_keys(positions, self.seed), cells))
+        cells = cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        rank = np.arange(len(cells)) - np.repeat(starts, np.diff(np.r_[starts, len(cells)]))
+        keep = rank < self.reservoir_size
+
+        self.cells = cells[keep].astype(self.grid.cells.dtype)
+        self.positions = positions[order[keep]].astype(position_dtype(offset + len(chunk)))
+        self._cache.clear()
+
+    # Muestra con el mismo número de filas por clase de default (si las hay; si una clase no
+    # llena su cupo, el resto lo completa la otra), fija entre reruns. Es exacta: las filas de
+    # clave más pequeña entre las que cumplen el filtro, sin sobrerrepresentar celdas pequeñas
+    def sample(self, df, default_value, age_range, income_range, size=SAMPLE_SIZE):
+        if size > self.reservoir_size:
+            raise ValueError(f"La muestra ({size} filas) supera el reservorio por celda ({self.reservoir_size})")
+        key = (default_value, tuple(age_range), tuple(income_range), size)
+        if key in self._cache:
+            return self._cache[key]
+
+        # Celdas completas desde su reservorio; las celdas que el filtro corta, con todas sus
+        # filas de la rejilla (como la corrección del cubo) filtradas por edad e ingresos
+        full, partial = self.grid.select(default_value, age_range, income_range)
+        inside = full[self.cells]
+        rows = self.grid.rows_in(partial)
+        cut = self.grid.positions[rows]
+        age = df['age'].iloc[cut].to_numpy(dtype='float64', na_value=np.nan)
+        income = df['income'].iloc[cut].to_numpy(dtype='float64', na_value=np.nan)
+        in_range = (age >= age_range[0]) & (age <= age_range[1]) & (income >= income_range[0]) & (income <= income_range[1])
+        positions = np.concatenate([self.positions[inside], cut[in_range]]).astype(np.int64)
+        cells = np.concatenate([self.cells[inside], self.grid.cells[rows][in_range]]).astype(np.int64)
+        defaults = cells // (self.grid.shape[1] * self.grid.shape[2])
+        keys = row_keys(positions, self.seed)
+
+        classes = [0, 1] if default_value is None else [default_value]
+        members = [np.flatnonzero(defaults == value) for value in classes]
+        quotas = class_quotas([len(m) for m in members], size)
+        chosen = np.concatenate([smallest_keys(m, keys[m], quota) for m, quota in zip(members, quotas)])
+        chosen = positions[chosen]
+
+        sample = pd.DataFrame({col: df[col].iloc[chosen].to_numpy(dtype='float64', na_value=np.nan) for col in SAMPLE_COLUMNS})
+        sample['default'] = sample['default'].astype(np.int64)
+        sample['default_label'] = pd.Categorical.from_codes(sample['default'], categories=DEFAULT_CATEGORIES)
+        if len(self._cache) >= QUERY_CACHE_SIZE:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = sample
+        return sample
+
+
+# Construcción en una sola pasada sobre bloques (p. ej. leídos del almacén por partes)
+def build_sampler(chunks, grid, reservoir_size=CELL_RESERVOIR, seed=SAMPLE_SEED):
+    sampler = StratifiedSampler(grid, reservoir_size, seed)
+    offset = 0
+    for chunk in chunks:
+        sampler.add_chunk(chunk, offset)
+        offset += len(chunk)
+    return sampler
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from sampling import row_keys
+from scoring import FEATURES, RISK_BANDS, feature_matrix
+
+# Variables que admiten un choque multiplicativo (cambio relativo, p. ej. -0.15 = -15%)
+SHOCKS = {'income': 'Ingresos', 'creddebt': 'Deuda de Crédito', 'othdebt': 'Otras Deudas'}
+
+# Rangos por defecto de los choques: ingresos a la baja y deudas al alza
+SHOCK_RANGES = {'income': (-0.15, 0.0), 'creddebt': (0.0, 0.20), 'othdebt': (0.0, 0.10)}
+N_SCENARIOS = 200
+SCENARIO_SEED = 42
+
+# Umbral de alto riesgo del notebook: total_deb_ratio por encima de su percentil 80 (histórico)
+HIGH_RISK_QUANTILE = 0.8
+
+# Filas de la cartera que se puntúan por escenario; por encima se usa una muestra reproducible.
+# Todos los escenarios usan la misma muestra, así que sus diferencias no dependen del muestreo
+SCENARIO_MAX_ROWS = 2_000
+
+# Filas (escenarios x préstamos) por bloque enviado al modelo: acota el pico de memoria
+SCENARIO_BLOCK_ROWS = 500_000
+
+KPI_COLUMNS = ['Tasa de Default', 'Clientes Alto Riesgo', 'Alto Riesgo (modelo)']
+
+
+# Ratio deuda total / ingresos del notebook (infinitos y nulos a 0)
+def total_debt_ratio(income, creddebt, othdebt):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (creddebt + othdebt) / income
+    ratio[~np.isfinite(ratio)] = 0
+    return ratio
+
+
+# Choques por hipercubo latino: cada variable cubre su rango en n estratos, sin repetir estrato
+def sample_shocks(ranges=SHOCK_RANGES, n=N_SCENARIOS, seed=SCENARIO_SEED):
+    rng = np.random.default_rng(seed)
+    shocks = np.empty((n, len(SHOCKS)))
+    for j, col in enumerate(SHOCKS):
+        low, high = ranges.get(col, (0.0, 0.0))
+        strata = (rng.permutation(n) + rng.random(n)) / n
+        shocks[:, j] = low + strata * (high - low)
+    return shocks
+
+
+# Motor de escenarios sobre una matriz de features fija: los choques se aplican por broadcasting
+# a bloques de escenarios, sin copiar el frame por escenario, y cada bloque se puntúa de una vez
+class ScenarioEngine:
+    def __init__(self, risk_model, df, positions=None, max_rows=SCENARIO_MAX_ROWS, seed=SCENARIO_SEED):
+        self.risk_model = risk_model
+        positions = np.arange(len(df)) if positions is None else np.asarray(positions)
+        if positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+        self.rows = len(positions)
+        if self.rows > max_rows:
+            positions = np.sort(positions[np.argsort(row_keys(positions, seed), kind='stable')[:max_rows]])
+        # Cada fila puntuada representa rows / muestra préstamos de la cartera filtrada
+        self.weight = self.rows / max(len(positions), 1)
+        self.X = feature_matrix(df.iloc[positions], risk_model.means)
+        self.columns = {col: FEATURES.index(col) for col in SHOCKS}
+        self.debtinc = FEATURES.index('debtinc')
+
+        # El ratio de deuda usa los valores sin imputar (nulos a 0, como el notebook) y su umbral
+        # queda fijo sobre la cartera completa sin choques: los escenarios se miden contra él
+        values = {col: df[col].to_numpy(dtype='float64', na_value=np.nan) for col in SHOCKS}
+        self.raw = np.column_stack([values[col][positions] for col in SHOCKS])
+        self.threshold = float(np.quantile(total_debt_ratio(**values), HIGH_RISK_QUANTILE)) if len(df) else 0.0
+
+    # Features con choques para un bloque de escenarios: (escenarios, préstamos, features)
+    def _shocked(self, factors):
+        X = np.repeat(self.X[None], len(factors), axis=0)
+        for j, col in enumerate(SHOCKS):
+            X[:, :, self.columns[col]] *= factors[:, j, None]
+        # debtinc sigue siendo coherente: escala con la deuda total de cada fila y con los ingresos
+        creddebt, othdebt = self.X[:, self.columns['creddebt']], self.X[:, self.columns['othdebt']]
+        total = creddebt + othdebt
+        shocked_total = X[:, :, self.columns['creddebt']] + X[:, :, self.columns['othdebt']]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            debt_factor = np.where(total > 0, shocked_total / total, 1.0)
+        X[:, :, self.debtinc] *= debt_factor / factors[:, list(SHOCKS).index('income'), None]
+        return X
+
+    # KPIs de cada escenario; shocks es (escenarios, len(SHOCKS)) con cambios relativos
+    def run(self, shocks, block_rows=SCENARIO_BLOCK_ROWS):
+        factors = 1 + np.atleast_2d(np.asarray(shocks, dtype='float64'))
+        n = len(self.X)
+        kpis = np.zeros((len(factors), len(KPI_COLUMNS)))
+        if n == 0:
+            return self._frame(factors, kpis * np.nan)
+        step = max(block_rows // n, 1)
+        for start in range(0, len(factors), step):
+            block = factors[start:start + step]
+            X = self._shocked(block)
+            proba = self.risk_model.predict_proba(X.reshape(-1, X.shape[2])).reshape(len(block), n)
+            raw = self.raw[None] * block[:, None, :]
+            ratio = total_debt_ratio(*(raw[:, :, j] for j in range(len(SHOCKS))))
+            kpis[start:start + len(block), 0] = proba.mean(axis=1)
+            kpis[start:start + len(block), 1] = (ratio > self.threshold).sum(axis=1) * self.weight
+            # Mismo corte que el segmento 'Riesgo Alto' de risk_segment
+            kpis[start:start + len(block), 2] = (proba >= RISK_BANDS[-1]).sum(axis=1) * self.weight
+        return self._frame(factors, kpis)
+
+    def baseline(self):
+        return self.run(np.zeros((1, len(SHOCKS)))).iloc[0]
+
+    def _frame(self, factors, kpis):
+        result = pd.DataFrame(factors - 1, columns=list(SHOCKS))
+        result[KPI_COLUMNS] = kpis
+        return result
+
+
+# Percentiles de cada KPI sobre los escenarios
+def scenario_summary(results, percentiles=(0.05, 0.5, 0.95)):
+    summary = results[KPI_COLUMNS].quantile(list(percentiles)).T
+    summary.columns = [f"P{int(p * 100)}" for p in percentiles]
+    return summary
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from cleaning import default_codes
+from data_store import iter_chunks
+from scoring import MODEL_DIR, RISK_SEGMENTS, load_model, model_exists, risk_segment
+
+CHUNK_ROWS = 500_000
+
+OUTPUT_SCHEMA = None if pa is None else pa.schema([
+    ('row', pa.int64()),
+    ('default_probability', pa.float64()),
+    ('risk_segment', pa.dictionary(pa.int8(), pa.string())),
+    # Etiqueta de default limpia (0/1); nula si la fila no trae etiqueta
+    ('default', pa.int8()),
+])
+
+# Modelo cargado una vez por proceso del pool
+_worker_model = None
+
+
+def _init_worker(model_dir):
+    global _worker_model
+    _worker_model = load_model(model_dir)
+
+
+# Mapeo de default del notebook y scoring con imputación por medias del modelo
+def score_chunk(chunk, offset):
+    rows = np.arange(offset, offset + len(chunk), dtype=np.int64)
+    codes = np.full(len(chunk), -1, dtype=np.int8)
+    if 'default' in chunk.columns:
+        # Se descartan las etiquetas presentes que no se reconocen, como en el dashboard; las
+        # filas sin etiqueta (un extracto a puntuar) se puntúan igual y salen con default nulo
+        codes, _ = default_codes(chunk['default'])
+        keep = (codes >= 0) | chunk['default'].isna().to_numpy()
+        if not keep.all():
+            chunk, rows, codes = chunk[keep], rows[keep], codes[keep]
+    # Un solo hilo por proceso: el paralelismo lo da el pool
+    proba = _worker_model.predict_proba(chunk, n_jobs=1)
+    segments = risk_segment(proba)
+    return pa.Table.from_arrays([
+        pa.array(rows),
+        pa.array(proba),
+        pa.DictionaryArray.from_arrays(pa.array(segments.codes, type=pa.int8()), pa.array(RISK_SEGMENTS)),
+        pa.array(codes, type=pa.int8(), mask=codes < 0),
+    ], schema=OUTPUT_SCHEMA)
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    scale = 1 / 1024 if sys.platform != 'darwin' else 1 / (1024 * 1024)
+    return own * scale, children * scale
+
+
+def run(input_path, output_path, model_dir=MODEL_DIR, chunk_rows=CHUNK_ROWS, workers=None):
+    # La salida es Parquet: sin pyarrow no hay forma de escribirla
+    if pq is None:
+        raise ImportError("El scoring por lotes necesita pyarrow para escribir Parquet (pip install pyarrow)")
+    if not model_exists(model_dir):
+        raise FileNotFoundError(f"No hay un modelo entrenado en {model_dir}")
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows_in = rows_out = 0
+    tmp_path = f"{output_path}.tmp"
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_dir,)) as pool, \
+            pq.ParquetWriter(tmp_path, OUTPUT_SCHEMA, compression='zstd') as writer:
+        # Como mucho 2 bloques en vuelo por worker: la memoria no crece con el archivo
+        pending = deque()
+        for chunk in iter_chunks(input_path, chunk_rows=chunk_rows):
+            pending.append(pool.submit(score_chunk, chunk, rows_in))
+            rows_in += len(chunk)
+            while len(pending) >= 2 * workers:
+                table = pending.popleft().result()
+                writer.write_table(table)
+                rows_out += table.num_rows
+        while pending:
+            table = pending.popleft().result()
+            writer.write_table(table)
+            rows_out += table.num_rows
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.perf_counter() - start
+    own_rss, worker_rss = peak_rss_mb()
+    return {
+        'input': input_path,
+        'output': output_path,
+        'rows_in': rows_in,
+        'rows_scored': rows_out,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows_in / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': round(own_rss, 1),
+        'peak_worker_rss_mb': round(worker_rss, 1),
+        'workers': workers,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring de riesgo por lotes sobre un archivo de préstamos")
+    parser.add_argument('input', help="Archivo CSV (separado por ';') o Parquet")
+    parser.add_argument('output', help="Archivo Parquet de salida con scores y segmentos")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--report', help="Ruta opcional para guardar el resumen en JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(args.input, args.output, args.model_dir, args.chunk_rows, args.workers)
+    except (FileNotFoundError, ImportError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(
+        f"✅ {summary['rows_scored']:,} de {summary['rows_in']:,} filas puntuadas en {summary['seconds']:.1f}s "
+        f"({summary['rows_per_sec']:,.0f} filas/s) · RSS pico {summary['peak_rss_mb']:.0f} MB "
+        f"(workers {summary['peak_worker_rss_mb']:.0f} MB)"
+    )
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# scikit-learn y joblib se importan al primer uso (ver _require_sklearn): quien solo necesita
+# FEATURES o las bandas de riesgo, como el arranque del dashboard, no paga su importación
+joblib = None
+RandomForestClassifier = None
+train_test_split = None
+
+# Variables y parámetros del Random Forest del notebook
+FEATURES = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt']
+MODEL_PARAMS = {'n_estimators': 100, 'max_depth': 10, 'random_state': 42}
+TEST_SIZE = 0.3
+
+MODEL_DIR = 'models'
+MODEL_FILE = 'risk_model.joblib'
+META_FILE = 'risk_model.json'
+
+# Filas por bloque al puntuar en lote
+SCORE_CHUNK_ROWS = 100_000
+
+# Bandas de score del informe ejecutivo
+RISK_BANDS = [0.3, 0.6]
+RISK_SEGMENTS = ['Riesgo Bajo', 'Riesgo Medio', 'Riesgo Alto']
+
+
+def _require_sklearn():
+    global joblib, RandomForestClassifier, train_test_split
+    if RandomForestClassifier is not None:
+        return
+    try:
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+    except ImportError:
+        raise ImportError("scikit-learn es necesario para el modelo de riesgo")
+
+
+def feature_matrix(df, means):
+    X = np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan) for col in FEATURES])
+    missing = np.isnan(X)
+    if missing.any():
+        X[missing] = np.take(means, np.nonzero(missing)[1])
+    return X
+
+
+class RiskModel:
+    def __init__(self, model, means, metadata=None):
+        self.model = model
+        self.means = np.asarray(means, dtype='float64')
+        self.metadata = metadata or {}
+
+    # Probabilidad de default por bloques, repartidos entre todos los núcleos
+    def predict_proba(self, df, chunk_rows=SCORE_CHUNK_ROWS, n_jobs=-1):
+        if isinstance(df, np.ndarray):
+            X = np.where(np.isnan(df), self.means, df)
+        else:
+            X = feature_matrix(df, self.means)
+        if len(X) == 0:
+            return np.empty(0)
+        default_column = list(self.model.classes_).index(1)
+        chunks = [X[start:start + chunk_rows] for start in range(0, len(X), chunk_rows)]
+        if len(chunks) == 1:
+            return self.model.predict_proba(chunks[0])[:, default_column]
+        # Los árboles de sklearn liberan el GIL al predecir: hilos sin copiar el modelo.
+        # El paralelismo va por bloques y cada bloque recorre los árboles en serie, sin tocar el
+        # n_jobs del bosque (el modelo se comparte entre sesiones e hilos)
+        _require_sklearn()
+        scores = joblib.Parallel(n_jobs=n_jobs, prefer='threads')(
+            joblib.delayed(self._forest_proba)(chunk, default_column) for chunk in chunks
+        )
+        return np.concatenate(scores)
+
+    # Promedio de las probabilidades de los árboles, igual que RandomForestClassifier.predict_proba
+    def _forest_proba(self, X, column):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        proba = np.zeros(len(X))
+        for tree in self.model.estimators_:
+            proba += tree.predict_proba(X, check_input=False)[:, column]
+        return proba / len(self.model.estimators_)
+
+
+def risk_segment(proba):
+    codes = np.searchsorted(RISK_BANDS, proba, side='right')
+    return pd.Categorical.from_codes(codes, categories=RISK_SEGMENTS)
+
+
+# Entrena como el notebook (holdout estratificado para la métrica), reentrena con todos los
+# datos y persiste el modelo junto con las medias de imputación
+def train_model(df, model_dir=MODEL_DIR, params=None, test_size=TEST_SIZE):
+    _require_sklearn()
+    params = {**MODEL_PARAMS, **(params or {})}
+    means = df[FEATURES].mean().to_numpy(dtype='float64')
+    X = feature_matrix(df, means)
+    y = df['default'].to_numpy()
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=params['random_state'], stratify=y
+    )
+    holdout = RandomForestClassifier(**params, n_jobs=-1).fit(X_train, y_train)
+    accuracy = float(holdout.score(X_test, y_test))
+
+    model = RandomForestClassifier(**params, n_jobs=-1).fit(X, y)
+    metadata = {
+        'features': FEATURES,
+        'params': params,
+        'means': means.tolist(),
+        'rows': len(df),
+        'holdout_accuracy': accuracy,
+    }
+    risk_model = RiskModel(model, means, metadata)
+    save_model(risk_model, model_dir)
+    return risk_model
+
+
+def save_model(risk_model, model_dir=MODEL_DIR):
+    _require_sklearn()
+    os.makedirs(model_dir, exist_ok=True)
+    # Sin compresión: permite cargar los arrays de los árboles con mmap
+    joblib.dump(risk_model.model, os.path.join(model_dir, MODEL_FILE), compress=0)
+    with open(os.path.join(model_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(risk_model.metadata, f, indent=2)
+
+
+def model_exists(model_dir=MODEL_DIR):
+    return os.path.exists(os.path.join(model_dir, MODEL_FILE)) and os.path.exists(os.path.join(model_dir, META_FILE))
+
+
+def load_model(model_dir=MODEL_DIR, mmap=True):
+    _require_sklearn()
+    with open(os.path.join(model_dir, META_FILE), encoding='utf-8') as f:
+        metadata = json.load(f)
+    model = joblib.load(os.path.join(model_dir, MODEL_FILE), mmap_mode='r' if mmap else None)
+    return RiskModel(model, metadata['means'], metadata)
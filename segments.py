@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+# Segmentaciones del notebook: bins fijos o cuantiles (calculados una vez por versión de datos)
+SEGMENTS = {
+    'age_segment': {
+        'column': 'age',
+        'bins': [0, 30, 45, 60, 100],
+        'labels': ['Joven (<=30)', 'Adulto (31-40)', 'Maduro (40-50)', 'Senior (60+)'],
+    },
+    'income_segment': {
+        'column': 'income',
+        'quantiles': 4,
+        'labels': ['Bajo', 'Medio-Bajo', 'Medio-Alto', 'Alto'],
+    },
+    'creddebt_segment': {
+        'column': 'creddebt',
+        'bins': [0, 10000, 10000000, 27000000],
+        'labels': ['Bajo', 'Medio', 'Alto'],
+    },
+}
+
+WILSON_Z = 1.96
+QUERY_CACHE_SIZE = 32
+
+
+def wilson_interval(successes, total, z=WILSON_Z):
+    successes = np.asarray(successes, dtype='float64')
+    total = np.asarray(total, dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = successes / total
+        denominator = 1 + z ** 2 / total
+        center = (p + z ** 2 / (2 * total)) / denominator
+        half = z * np.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominator
+    return center - half, center + half
+
+
+# Códigos enteros como pd.cut (intervalos cerrados a la derecha; qcut incluye el mínimo)
+def bin_codes(values, edges, include_lowest=False):
+    codes = np.searchsorted(edges, values, side='left') - 1
+    if include_lowest:
+        codes[values == edges[0]] = 0
+    codes[(codes < 0) | (codes >= len(edges) - 1) | np.isnan(values)] = -1
+    return codes.astype(np.int8)
+
+
+def rate_table(codes, default, labels):
+    n = len(labels)
+    valid = codes >= 0
+    count = np.bincount(codes[valid], minlength=n)
+    total_default = np.bincount(codes[valid], weights=default[valid], minlength=n)
+    low, high = wilson_interval(total_default, count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = total_default / count
+    return pd.DataFrame({
+        'Total_Casos': count,
+        'Total_Default': total_default.astype(np.int64),
+        'Tasa_Default': rate,
+        'IC_Inferior': low,
+        'IC_Superior': high,
+    }, index=pd.Index(labels, name='Segmento'))
+
+
+class SegmentEngine:
+    def __init__(self, df, segments=SEGMENTS):
+        self.segments = segments
+        self.edges = {}
+        self.codes = {}
+        for name, spec in segments.items():
+            values = df[spec['column']].to_numpy(dtype='float64', na_value=np.nan)
+            if 'quantiles' in spec:
+                # Bordes por cuantiles una sola vez por versión de datos
+                edges = np.nanquantile(values, np.linspace(0, 1, spec['quantiles'] + 1))
+                self.codes[name] = bin_codes(values, edges, include_lowest=True)
+            else:
+                edges = np.asarray(spec['bins'], dtype='float64')
+                self.codes[name] = bin_codes(values, edges)
+            self.edges[name] = edges
+        self.default = df['default'].to_numpy()
+        self._cache = OrderedDict()
+
+    # Tablas por segmento y tablas cruzadas para las filas filtradas (None = todas)
+    def query(self, positions=None, key=None):
+        if key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        default = self.default if positions is None else self.default[positions]
+        codes = {name: c if positions is None else c[positions] for name, c in self.codes.items()}
+        tables = {name: rate_table(codes[name], default, spec['labels']) for name, spec in self.segments.items()}
+
+        crosstabs = {}
+        for a, b in combinations(self.segments, 2):
+            labels_a, labels_b = self.segments[a]['labels'], self.segments[b]['labels']
+            combined = np.where((codes[a] >= 0) & (codes[b] >= 0), codes[a].astype(np.int64) * len(labels_b) + codes[b], -1)
+            labels = [f"{la} | {lb}" for la in labels_a for lb in labels_b]
+            table = rate_table(combined, default, labels)
+            table.index = pd.MultiIndex.from_product([labels_a, labels_b], names=[a, b])
+            crosstabs[a, b] = table
+
+        result = {'tables': tables, 'crosstabs': crosstabs}
+        if key is not None:
+            self._cache[key] = result
+            if len(self._cache) > QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
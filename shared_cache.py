@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+
+# Caché en disco compartida por todos los procesos y sesiones del dashboard
+CACHE_DIR = os.path.join('.cache', 'shared')
+MAX_BYTES = 512 * 1024 * 1024
+MAX_ENTRIES = 2000
+
+# Las entradas son figuras serializadas en JSON de Plotly
+FIGURE = '.json'
+
+
+def cache_key(*parts):
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+# Entradas inmutables escritas de forma atómica; la fecha de acceso marca el orden LRU
+class SharedCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, kind):
+        return os.path.join(self.cache_dir, f"{cache_key(*key)}{kind}")
+
+    def _read(self, key, kind):
+        path = self._path(key, kind)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Otra sesión pudo desalojar la entrada entre la consulta y la lectura
+            return None
+        return data
+
+    def _write(self, key, kind, data):
+        path = self._path(key, kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_figure(self, key):
+        data = self._read(key, FIGURE)
+        return None if data is None else data.decode('utf-8')
+
+    def put_figure(self, key, figure_json):
+        self._write(key, FIGURE, figure_json.encode('utf-8'))
+        return figure_json
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    # Desaloja las entradas menos usadas hasta cumplir los límites de tamaño y cantidad
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
@@ -0,0 +1,302 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cleaning import DEFAULT_CATEGORIES
+
+SKETCH_COLUMNS = ['age', 'ed', 'employ', 'address', 'income', 'debtinc', 'creddebt', 'othdebt']
+
+# Capacidad por nivel del sketch: el error de rango garantizado se acumula en cada compactación
+SKETCH_K = 2048
+
+# Bordes fijos, iguales para todas las particiones: los histogramas se fusionan sumando conteos.
+# Enteros pequeños con bins unitarios; montos con 16 bins logarítmicos por década.
+HISTOGRAM_EDGES = {
+    'age': np.arange(0, 152, dtype='float64'),
+    'ed': np.arange(0, 12, dtype='float64'),
+    'employ': np.arange(0, 102, dtype='float64'),
+    'address': np.arange(0, 102, dtype='float64'),
+}
+MONEY_EDGES = np.concatenate([[0.0], np.logspace(0, 12, 12 * 16 + 1)])
+
+
+def histogram_edges(col):
+    return HISTOGRAM_EDGES.get(col, MONEY_EDGES)
+
+
+# Sketch de cuantiles tipo KLL con compactores de capacidad fija: se actualiza por lotes,
+# se fusiona concatenando niveles y lleva la cota exacta del error de rango acumulado
+class QuantileSketch:
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.levels = []
+        self.compactions = []
+        self.n = 0
+        self.error = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._view = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        # Media y M2 combinadas como en correlation.py (Chan)
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        self._combine_moments(len(values), mean, m2)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._add_level(0, values)
+        self._compress()
+        return self
+
+    def _combine_moments(self, n, mean, m2):
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    def _add_level(self, h, values):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0))
+            self.compactions.append(0)
+        self.levels[h] = np.concatenate([self.levels[h], values])
+        self._view = None
+
+    # Compactar un buffer ordenado de peso 2^h (se promueve uno de cada dos) cambia
+    # cualquier rango como mucho en 2^h; el desfase alterna para que los errores se compensen
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            buffer = self.levels[h]
+            if len(buffer) > self.k:
+                buffer = np.sort(buffer)
+                keep = buffer[len(buffer) - len(buffer) % 2:]
+                buffer = buffer[:len(buffer) - len(keep)]
+                offset = self.compactions[h] % 2
+                self.levels[h] = keep
+                self.compactions[h] += 1
+                self.error += 2 ** h
+                self._add_level(h + 1, buffer[offset::2])
+            h += 1
+
+    def merge(self, other):
+        merged = QuantileSketch(self.k)
+        for sketch in (self, other):
+            if sketch.n == 0:
+                continue
+            merged._combine_moments(sketch.n, sketch.mean, sketch.m2)
+            merged.error += sketch.error
+            merged.min = min(merged.min, sketch.min)
+            merged.max = max(merged.max, sketch.max)
+            for h, level in enumerate(sketch.levels):
+                merged._add_level(h, level)
+        merged._compress()
+        return merged
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else None
+
+    # Cota del error de rango normalizado: |rango estimado - rango real| <= epsilon * n
+    @property
+    def epsilon(self):
+        return self.error / self.n if self.n else 0.0
+
+    def _sorted(self):
+        if self._view is None:
+            items = np.concatenate(self.levels) if self.levels else np.empty(0)
+            weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)]) \
+                if self.levels else np.empty(0, dtype=np.int64)
+            order = np.argsort(items, kind='stable')
+            self._view = (items[order], np.cumsum(weights[order]))
+        return self._view
+
+    def quantile(self, q):
+        q = np.asarray(q, dtype='float64')
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        items, cumulative = self._sorted()
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = items[np.clip(index, 0, len(items) - 1)]
+        # Los extremos son exactos
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result
+
+    # Dato retenido más cercano dentro del intervalo (aproxima los bigotes del box plot)
+    def nearest_within(self, low, high):
+        items, _ = self._sorted()
+        inside = items[(items >= low) & (items <= high)]
+        if len(inside) == 0:
+            return low, high
+        return max(inside[0], self.min), min(inside[-1], self.max)
+
+    def state(self):
+        return {
+            'k': self.k, 'n': self.n, 'error': self.error, 'mean': self.mean, 'm2': self.m2,
+            'min': float(self.min), 'max': float(self.max), 'compactions': self.compactions,
+        }
+
+    @classmethod
+    def from_state(cls, state, levels):
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.error = state['error']
+        sketch.mean = state['mean']
+        sketch.m2 = state['m2']
+        sketch.min = state['min']
+        sketch.max = state['max']
+        sketch.compactions = list(state['compactions'])
+        sketch.levels = list(levels)
+        return sketch
+
+
+# Sketches e histogramas de bins fijos por columna numérica y por clase de default
+class PortfolioSketch:
+    def __init__(self, columns=SKETCH_COLUMNS, k=SKETCH_K):
+        self.columns = list(columns)
+        self.k = k
+        self.rows = 0
+        self.sketches = {col: [QuantileSketch(k) for _ in DEFAULT_CATEGORIES] for col in self.columns}
+        self.histograms = {
+            col: np.zeros((len(DEFAULT_CATEGORIES), len(histogram_edges(col)) + 1), dtype=np.int64)
+            for col in self.columns
+        }
+        self.missing = {col: np.zeros(len(DEFAULT_CATEGORIES), dtype=np.int64) for col in self.columns}
+        self._merged = {}
+
+    # El bloque debe venir limpio (default 0/1); una sola pasada por columna y clase
+    def add_chunk(self, chunk):
+        default = chunk['default'].to_numpy().astype(np.int64)
+        self.rows += len(chunk)
+        for col in self.columns:
+            values = chunk[col].to_numpy(dtype='float64', na_value=np.nan)
+            missing = np.isnan(values)
+            self.missing[col] += np.bincount(default[missing], minlength=len(DEFAULT_CATEGORIES))
+            # 0 = por debajo del primer borde, len(edges) = por encima del último
+            bins = np.searchsorted(histogram_edges(col), values[~missing], side='right')
+            n_slots = self.histograms[col].shape[1]
+            self.histograms[col] += np.bincount(
+                default[~missing] * n_slots + bins, minlength=self.histograms[col].size
+            ).reshape(self.histograms[col].shape)
+            for code, sketch in enumerate(self.sketches[col]):
+                sketch.update(values[default == code])
+        self._merged = {}
+        return self
+
+    def merge(self, other):
+        merged = PortfolioSketch(self.columns, self.k)
+        merged.rows = self.rows + other.rows
+        for col in self.columns:
+            merged.sketches[col] = [a + b for a, b in zip(self.sketches[col], other.sketches[col])]
+            merged.histograms[col] = self.histograms[col] + other.histograms[col]
+            merged.missing[col] = self.missing[col] + other.missing[col]
+        return merged
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def sketch(self, col, default_value=None):
+        if default_value is not None:
+            return self.sketches[col][default_value]
+        if col not in self._merged:
+            self._merged[col] = self.sketches[col][0] + self.sketches[col][1]
+        return self._merged[col]
+
+    def histogram(self, col, default_value=None):
+        counts = self.histograms[col]
+        return counts.sum(axis=0) if default_value is None else counts[default_value]
+
+    def bounds(self, col):
+        sketch = self.sketch(col)
+        return sketch.min, sketch.max
+
+    # Préstamos por clase: toda fila cuenta en el sketch o en los faltantes de cualquier columna
+    def class_counts(self):
+        col = self.columns[0]
+        return np.array([s.n for s in self.sketches[col]], dtype=np.int64) + self.missing[col]
+
+    # Métricas Clave sin el frame: mismas claves que KPICube.query, solo por estado del préstamo
+    def kpis(self, default_value=None):
+        counts = self.class_counts()
+        count = int(counts.sum() if default_value is None else counts[default_value])
+        means = {'default': np.nan if count == 0 else float(counts[1] / count) if default_value is None else float(default_value)}
+        for col in ('income', 'age'):
+            sketch = self.sketch(col, default_value)
+            means[col] = sketch.mean if sketch.n else np.nan
+        return {'count': count, 'mean': means}
+
+    # Faltantes por columna con la forma del perfil de datos (para profiling.missing_frame)
+    def missing_profile(self):
+        return {'rows': self.rows, 'columns': {col: {'missing': int(self.missing[col].sum())} for col in self.columns}}
+
+    def epsilon(self, default_value=None):
+        return max(self.sketch(col, default_value).epsilon for col in self.columns)
+
+    def describe(self, default_value=None):
+        stats = {}
+        for col in self.columns:
+            sketch = self.sketch(col, default_value)
+            q1, median, q3 = sketch.quantile([0.25, 0.5, 0.75]) if sketch.n else [np.nan] * 3
+            stats[col] = [
+                sketch.n, sketch.mean if sketch.n else np.nan, sketch.std,
+                sketch.min if sketch.n else np.nan, q1, median, q3, sketch.max if sketch.n else np.nan,
+            ]
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], dtype='float64')
+
+    def save(self, path):
+        arrays = {}
+        state = {'columns': self.columns, 'k': self.k, 'rows': self.rows, 'sketches': {}}
+        for col in self.columns:
+            arrays[f"{col}/histogram"] = self.histograms[col]
+            arrays[f"{col}/missing"] = self.missing[col]
+            state['sketches'][col] = []
+            for code, sketch in enumerate(self.sketches[col]):
+                state['sketches'][col].append(sketch.state())
+                for h, level in enumerate(sketch.levels):
+                    arrays[f"{col}/{code}/{h}"] = level
+        arrays['state'] = np.array(json.dumps(state))
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            state = json.loads(str(data['state']))
+            portfolio = cls(state['columns'], state['k'])
+            portfolio.rows = state['rows']
+            for col in portfolio.columns:
+                portfolio.histograms[col] = data[f"{col}/histogram"]
+                portfolio.missing[col] = data[f"{col}/missing"]
+                portfolio.sketches[col] = [
+                    QuantileSketch.from_state(
+                        sketch_state,
+                        [data[f"{col}/{code}/{h}"] for h in range(len(sketch_state['compactions']))]
+                    )
+                    for code, sketch_state in enumerate(state['sketches'][col])
+                ]
+        return portfolio
+
+
+# Reagrupa los bins finos en bins de visualización según su borde izquierdo: un bin fino
+# [v, v + 1) de una columna entera cae en el bin de visualización que contiene a v (los de
+# histogram_edges para enteros son [v - 0.5, v + 0.5)); en el resto de columnas el
+# desplazamiento máximo de un conteo es el ancho de su bin fino
+def rebin(edges, counts, display_edges):
+    inner = counts[1:-1]
+    index = np.clip(np.searchsorted(display_edges, edges[:-1], side='right') - 1, 0, len(display_edges) - 2)
+    display = np.bincount(index, weights=inner, minlength=len(display_edges) - 1)
+    display[0] += counts[0]
+    display[-1] += counts[-1]
+    return display.astype(np.int64)
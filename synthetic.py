@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cleaning import default_codes
+from data_store import CSV_PATH, NUMERIC_COLUMNS
+
+SYNTHETIC_SEED = 42
+GENERATOR_CHUNK_ROWS = 1_000_000
+
+
+# Ajusta al archivo fuente: proporción de cada etiqueta cruda de default (incluidas las sucias)
+# y, por clase, la función de cuantiles empírica y la tasa de faltantes de cada columna
+def fit_spec(source=CSV_PATH):
+    raw = pd.read_csv(source, sep=';', encoding='utf-8-sig', dtype={'default': str})
+    labels = raw['default'].fillna('').value_counts()
+    codes, _ = default_codes(raw['default'])
+    spec = {
+        'source': os.path.basename(source),
+        'columns': list(raw.columns),
+        'labels': {label: {'weight': int(count)} for label, count in labels.items()},
+        'classes': {},
+    }
+    for label in spec['labels']:
+        label_codes, _ = default_codes(pd.Series([label or None]))
+        spec['labels'][label]['code'] = int(label_codes[0])
+
+    for code in np.unique(codes):
+        rows = raw[codes == code]
+        columns = {}
+        for col in NUMERIC_COLUMNS:
+            values = rows[col].to_numpy(dtype='float64', na_value=np.nan)
+            present = np.sort(values[~np.isnan(values)])
+            columns[col] = {
+                'missing_rate': float(np.isnan(values).mean()) if len(values) else 0.0,
+                'quantiles': present.tolist(),
+                'integer': bool(np.all(present == np.round(present))),
+            }
+        spec['classes'][str(int(code))] = columns
+    return spec
+
+
+def _sample_column(column, rows, rng):
+    quantiles = np.asarray(column['quantiles'], dtype='float64')
+    if len(quantiles) == 0:
+        return pd.array(np.full(rows, np.nan), dtype='Float64')
+    # Inversa de la CDF empírica con interpolación lineal entre valores observados
+    position = rng.random(rows) * (len(quantiles) - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, len(quantiles) - 1)
+    values = quantiles[low] + (quantiles[high] - quantiles[low]) * (position - low)
+    missing = rng.random(rows) < column['missing_rate']
+    if column['integer']:
+        return pd.arrays.IntegerArray(np.round(values).astype(np.int64), missing)
+    values[missing] = np.nan
+    return values
+
+
+def generate_chunk(spec, rows, rng):
+    labels = list(spec['labels'])
+    weights = np.array([spec['labels'][label]['weight'] for label in labels], dtype='float64')
+    drawn = rng.choice(len(labels), size=rows, p=weights / weights.sum())
+    label_codes = np.array([spec['labels'][label]['code'] for label in labels])[drawn]
+
+    chunk = pd.DataFrame(index=np.arange(rows))
+    for col in NUMERIC_COLUMNS:
+        column = pd.Series(pd.NA, index=chunk.index, dtype='Int64')
+        for code, columns in spec['classes'].items():
+            mask = label_codes == int(code)
+            if mask.any():
+                sample = _sample_column(columns[col], int(mask.sum()), rng)
+                if not isinstance(sample, pd.arrays.IntegerArray):
+                    column = column.astype('Float64')
+                column[mask] = sample
+        chunk[col] = column
+    chunk['default'] = np.array(labels, dtype=object)[drawn]
+    chunk.loc[chunk['default'] == '', 'default'] = None
+    return chunk[spec['columns']]
+
+
+# Escribe un CSV con el mismo formato que Bankloan.csv (';', BOM UTF-8) por bloques
+def write_synthetic(path, rows, spec=None, seed=SYNTHETIC_SEED, chunk_rows=GENERATOR_CHUNK_ROWS):
+    spec = spec or fit_spec()
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.tmp"
+    written = 0
+    with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+        while written < rows:
+            chunk = generate_chunk(spec, min(chunk_rows, rows - written), rng)
+            chunk.to_csv(f, sep=';', index=False, header=written == 0, lineterminator='\n')
+            written += len(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera carteras sintéticas con la forma de Bankloan.csv")
+    parser.add_argument('output', help="CSV de salida")
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--source', default=CSV_PATH)
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--spec', help="Ruta opcional para guardar el ajuste en JSON")
+    args = parser.parse_args(argv)
+
+    spec = fit_spec(args.source)
+    if args.spec:
+        with open(args.spec, 'w', encoding='utf-8') as f:
+            json.dump(spec, f)
+    write_synthetic(args.output, args.rows, spec, args.seed)
+    print(f"✅ {args.rows:,} filas sintéticas escritas en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
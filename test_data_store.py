@@ -0,0 +1,28 @@
+import pandas as pd
+
+from cleaning import clean_portfolio
+from data_store import load_portfolio
+
+DIRTY_CSV = """age;ed;employ;address;income;debtinc;creddebt;othdebt;default
+41;3;17;12;176000000;9300000;11359392;5008608;1
+40000;1;10;6;31000000;17300000;1362202;4000798;0
+abc;1;15;7;;5500000;856075;2168925;0
+27.6;2;15;14;120000000;2900000;2658720;821280;0
+"""
+
+
+def test_load_portfolio_nulls_and_reports_dirty_values(tmp_path):
+    csv_path = tmp_path / 'dirty.csv'
+    csv_path.write_text(DIRTY_CSV, encoding='utf-8')
+
+    df = load_portfolio(str(csv_path), store_path=str(tmp_path / 'dirty.parquet'))
+    assert str(df['age'].dtype) == 'Int16'
+    assert df['age'].tolist()[0] == 41
+    assert df['age'].isna().tolist() == [False, True, True, True]
+
+    clean, report = clean_portfolio(df)
+    assert len(clean) == 4
+    assert report['malformed_values'] == {'age': 2}
+    assert report['out_of_range'] == {'age': 1}
+    assert report['nan_counts']['age'] == 3
+    assert pd.isna(clean['income'][2])
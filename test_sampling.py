@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from kpi_cube import BucketGrid
+from sampling import SAMPLE_SIZE, build_sampler, row_keys
+
+
+def portfolio(n, default_rate, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.integers(20, 60, size=n).astype('float64'),
+        'income': rng.lognormal(17, 0.6, size=n).round(),
+        'debtinc': rng.uniform(0, 4e7, size=n).round(),
+        'default': (rng.random(n) < default_rate).astype(np.int8),
+    })
+
+
+def expected_sample(df, age_range, income_range, quotas):
+    mask = df['age'].between(*age_range) & df['income'].between(*income_range)
+    positions = np.flatnonzero(mask.to_numpy())
+    chosen = []
+    for value, quota in quotas.items():
+        members = positions[df['default'].to_numpy()[positions] == value]
+        chosen.append(members[np.argsort(row_keys(members), kind='stable')[:quota]])
+    return np.concatenate(chosen)
+
+
+def test_narrow_filter_returns_full_sample_with_equal_class_shares():
+    df = portfolio(40_000, default_rate=0.3)
+    grid = BucketGrid(df)
+    sampler = build_sampler((df.iloc[start:start + 7_000] for start in range(0, len(df), 7_000)), grid)
+
+    # Dos años de edad: pocas celdas, cada una con muchas más filas que su reservorio; el
+    # rango de ingresos corta celdas por la mitad
+    for income_range in [(0, 1e12), (2e7, 3e7)]:
+        sample = sampler.sample(df, None, (30, 31), income_range)
+        mask = df['age'].between(30, 31) & df['income'].between(*income_range)
+        defaults = min(int((mask & (df['default'] == 1)).sum()), SAMPLE_SIZE // 2)
+        assert len(sample) == SAMPLE_SIZE
+        assert (sample['default'] == 1).sum() == defaults
+
+        expected = expected_sample(df, (30, 31), income_range, {0: SAMPLE_SIZE - defaults, 1: defaults})
+        np.testing.assert_array_equal(sample['income'].to_numpy(), df['income'].to_numpy()[expected])
+
+
+def test_unused_class_quota_goes_to_the_other_class():
+    df = portfolio(40_000, default_rate=0.002)
+    sampler = build_sampler([df], BucketGrid(df))
+
+    sample = sampler.sample(df, None, (25, 54), (0, 1e12))
+    defaults = int((df['age'].between(25, 54) & (df['default'] == 1)).sum())
+    assert defaults < SAMPLE_SIZE // 2
+    assert len(sample) == SAMPLE_SIZE
+    assert (sample['default'] == 1).sum() == defaults
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from aggregations import HISTOGRAM_BINS, histogram_counts, histogram_edges
+from sketches import PortfolioSketch, histogram_edges as sketch_edges, rebin
+
+
+def test_rebin_matches_exact_histogram_on_integer_column():
+    rng = np.random.default_rng(0)
+    ed = rng.choice([1, 2, 3, 4, 5], size=500, p=[0.5, 0.25, 0.15, 0.07, 0.03]).astype('float64')
+    default = rng.integers(0, 2, size=500)
+    sketch = PortfolioSketch(['ed']).add_chunk(pd.DataFrame({'ed': ed, 'default': default}))
+
+    edges, exact = histogram_counts(ed, default, n_classes=2, bins=HISTOGRAM_BINS)
+    display_edges = histogram_edges(np.array(sketch.bounds('ed')), bins=HISTOGRAM_BINS)
+    np.testing.assert_array_equal(display_edges, edges)
+    for code in (0, 1):
+        np.testing.assert_array_equal(rebin(sketch_edges('ed'), sketch.histogram('ed', code), display_edges), exact[code])
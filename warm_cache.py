@@ -0,0 +1,56 @@
+import argparse
+import sys
+import time
+
+from charts import cached_figures, overview_figures
+from data_store import CSV_PATH
+from filters import default_ranges
+from ingestion import PORTFOLIO_DIR, PortfolioStore
+from profiling import load_or_build_profile
+from shared_cache import CACHE_DIR, SharedCache
+
+
+# Precalcula la vista inicial del dashboard (Resumen General sin filtrar) en la caché
+# compartida, para que la primera carga de cualquier sesión sea inmediata (última versión del almacén)
+def warm(data_path=CSV_PATH, cache_dir=CACHE_DIR, store_dir=PORTFOLIO_DIR):
+    start = time.perf_counter()
+    cache = SharedCache(cache_dir)
+    store = PortfolioStore(store_dir)
+    store.sync_base(data_path)
+    state = store.state()
+    df, data_hash = state.df, state.version_id
+    load_or_build_profile(df, data_path, data_hash, state.report)
+
+    filter_index = state.filter_index
+    age_range, income_range = default_ranges(filter_index.bounds)
+    view = filter_index.view(df, None, age_range, income_range)
+    cached_figures(cache, (data_hash, 'overview', view.filters), overview_figures, view)
+
+    return {
+        'data_hash': data_hash,
+        'rows': len(df),
+        'seconds': round(time.perf_counter() - start, 3),
+        'entries': len(cache.entries()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula la caché compartida del dashboard")
+    parser.add_argument('--data', default=CSV_PATH)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--store', default=PORTFOLIO_DIR)
+    parser.add_argument('--clear', action='store_true', help="Vacía la caché antes de precalcular")
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        SharedCache(args.cache_dir).clear()
+    summary = warm(args.data, args.cache_dir, args.store)
+    print(
+        f"✅ Caché lista: {summary['rows']:,} filas (versión {summary['data_hash']}) "
+        f"en {summary['seconds']:.1f}s · {summary['entries']} entradas"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())